@@ -0,0 +1,639 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Benchmarks
+
+# This boots a copy of the interpreter the same way rpl.py does, minus the
+# REPL, and then times a few bits of RPL against it.  Run it with the names
+# of the benchmarks you're interested in, or with none of them to run the
+# lot.  Nothing here is needed to actually use the language.
+
+from trivia import *
+import parse, runtime, rtypes, internals, image
+
+import sys, os, io, gc, time, types, tempfile, contextlib, tracemalloc, \
+       subprocess, resource
+
+# How many times to run each timed thing.  We keep the best time, since
+# everything else is just the computer having other plans.
+REPEATS = 7
+
+# Boot a full runtime.  A blank command line file stands in for ARGS, so
+# boot.rpl finishes up instead of dropping into the REPL.
+def boot():
+  ourRT = runtime.rplruntime(rtypes.baseregistry())
+  ourRT.sto([INTERNALSDIR], ourRT.firstdir(ourRT.lastobj))
+  internals.stoprocs(ourRT, INTERNALSDIR)
+  ourRT.sto(['VERSION'], rtypes.typestr(VERSION))
+  ourRT.sto(['BASDIR'], rtypes.typestr(BASDIR))
+  with tempfile.NamedTemporaryFile('w', suffix='.rpl') as blank:
+    ourRT.Stack.push(rtypes.typestr(blank.name))
+    with quietly(ourRT):
+      ourRT.rs(parse.parse(ourRT, LAUNCHCODE).eval)
+  return ourRT
+
+# Keep DISP and friends from cluttering up our report, including whatever
+# the runtime still has saved up to say at the end.
+@contextlib.contextmanager
+def quietly(rt=None):
+  with contextlib.redirect_stdout(open(os.devnull, 'w')):
+    try:
+      yield
+    finally:
+      if rt is not None:
+        rt.flush()
+
+# Run some RPL text to completion on an already booted runtime.  It gets a
+# context of its own on top of the bottom one, which is emptied first, so
+# that nothing an error left half done gets returned to afterward, and so
+# that locals it ends on don't outstay it.
+def run(rt, text):
+  code = parse.parse(rt, ':: '+text+' ;')
+  while rt.Context.next is not rt.Context:
+    rt.Context = rt.Context.next
+  rt.Context.code, rt.Context.ip = rt.nullcode, 0
+  rt.Context = rtypes.typecontext(code, rt.Context.names, rt.Context)
+  rt.resume()
+  rt.rs(rt.Context.eval)
+  return code
+
+# Run parsed code and count the trampoline steps it takes.
+def steps(rt, code):
+  count = 0
+  rt.resume()
+  next = code.eval
+  while rt.Running:
+    next = next(rt)
+    count += 1
+  return count
+
+# Best wall clock time for running parsed code.
+def timed(rt, code, repeats=REPEATS):
+  best = None
+  for i in range(repeats):
+    rt.resume()
+    # Like timeit, leave the garbage collector out of it.
+    gc.disable()
+    start = time.perf_counter()
+    rt.rs(code.eval)
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+# Report a time per trampoline step.
+def report(label, seconds, count):
+  print('  %-24s %10.4f s  %8.1f ns/step  (%d steps)' %
+        (label, seconds, seconds/count*1e9, count))
+
+
+# #####################################################
+# The benchmarks themselves.  Each receives a booted runtime.
+
+# McCarthy's 91 function from mfx.rpl, unoptimized and STATICN'd, and the
+# Mandelbrot from m.rpl, stepped plainly and through threaded code.
+def threadcode(rt):
+  with quietly(rt):
+    run(rt, '''
+      ':: DUP #100 > ':: #10 - ; ':: #11 + m m ; IFTE ; 'm STO
+      '::
+        ':: DUP #100 > ':: #10 - ; ':: #11 + f f ; IFTE ;
+        DUP { f } LOCAL ;
+      STATICN 'f STO
+      BASDIR "m.rpl" + DSK> #40 width''')
+  cases = [['mfx.rpl m', '#-2000 m DROP'],
+           ['mfx.rpl f', '#-2000 f DROP'],
+           ['m.rpl run', 'run']]
+  methods = [['plain', rtypes.typecontext.evalplain],
+             ['threaded', rtypes.typecontext.evalthreaded]]
+  for name, text in cases:
+    code = parse.parse(rt, ':: '+text+' ;')
+    with quietly(rt):
+      count = steps(rt, code)
+    # Take turns, so neither one gets all the quiet moments.
+    best = {}
+    for i in range(REPEATS):
+      for label, method in methods:
+        rtypes.typecontext.eval = method
+        with quietly(rt):
+          seconds = timed(rt, code, 1)
+        best[label] = min(seconds, best.get(label, seconds))
+    print(name+':')
+    for label, method in methods:
+      report(label, best[label], count)
+  rtypes.typecontext.eval = rtypes.typecontext.evalthreaded if THREADCODE \
+                            else rtypes.typecontext.evalplain
+
+  # Threading only changes the steps contexts take, about a third of the
+  # lot, so over whole programs the difference is hard to see.  Here's one
+  # of those steps by itself, a hundred times over.
+  context = rtypes.typecontext(rtypes.typecode([rtypes.typeint(i)
+                                                for i in range(100)]), None)
+  print('a step of a context:')
+  for label, method in methods:
+    best = None
+    for i in range(REPEATS):
+      start = time.perf_counter()
+      for j in range(1000):
+        context.ip = 0
+        for k in range(100):
+          method(context, rt)
+      elapsed = time.perf_counter() - start
+      best = min(elapsed, best or elapsed)
+    report(label, best, 100000)
+
+# Memory: what booting costs, both as the operating system sees it and as
+# Python does, then what each sort of object costs.  Each layout is measured
+# in a fresh interpreter, so it isn't flattered or burdened by anything else
+# here: first as things were before rtypes had __slots__, then as they are.
+def memory(rt):
+  results = []
+  for slotted in [False, True]:
+    out = subprocess.run([sys.executable, '-c',
+                          'import bench; bench.layout(%r)' % slotted],
+                         capture_output=True, text=True).stdout
+    results.append(dict([i.split('\t') for i in out.splitlines()]))
+  before, after = results
+  print('  %-24s %10s %10s' % ('', 'before', 'after'))
+  for name in before:
+    print('  %-24s %10s %10s' % (name, before[name], after.get(name, '?')))
+
+# The rtypes classes laid out as they were before they had __slots__, each
+# with a __dict__ for everything, swapped in wherever they're to be found.
+# It's meant for a fresh interpreter, before anything's been made.
+def unslot():
+  made = {}
+  def remake(cls):
+    if cls.__module__ != 'rtypes':
+      return cls
+    if not cls in made:
+      names = {k: v for k, v in vars(cls).items()
+               if not k in ('__slots__', '__dict__', '__weakref__') and
+                  not isinstance(v, types.MemberDescriptorType)}
+      made[cls] = type(cls.__name__, tuple(map(remake, cls.__bases__)), names)
+    return made[cls]
+  for module in [rtypes, parse, runtime, internals, image]:
+    for name, obj in list(vars(module).items()):
+      if isinstance(obj, type):
+        setattr(module, name, remake(obj))
+
+# Our peak RSS in KiB.  On Linux, getrusage's figure carries over from
+# whoever started us, which for memory() is a runtime that's already booted,
+# so we ask /proc instead where we can.
+def peakrss():
+  try:
+    with open('/proc/self/status') as status:
+      for line in status:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1])
+  except OSError:
+    pass
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+# What memory() reports, for one layout or the other, as name and value
+# separated by a tab.
+def layout(slotted):
+  if not slotted:
+    unslot()
+  # Booting, first as the operating system sees it, then as Python does.
+  rt = boot()
+  print('boot peak RSS KiB\t%d' % peakrss())
+  tracemalloc.start()
+  boot()
+  size, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  print('boot allocated KiB\t%.1f' % (size/1024))
+  print('boot peak allocated KiB\t%.1f' % (peak/1024))
+
+  samples = [['Integer',   lambda i: rtypes.typeint(i)],
+             ['Float',     lambda i: rtypes.typefloat(i)],
+             ['String',    lambda i: rtypes.typestr('')],
+             ['Symbol',    lambda i: rtypes.typesym(['x'])],
+             ['Tag',       lambda i: rtypes.typetag('x', rt.nulltag)],
+             ['Directory', lambda i: rtypes.typedir(rt.nulltag, rt.lastobj)],
+             ['List',      lambda i: rtypes.typelst([rt.nulltag])],
+             ['Context',   lambda i: rtypes.typecontext(rt.nullcode, rt.lastobj)]]
+  count = 10000
+  for name, make in samples:
+    tracemalloc.start()
+    objects = [make(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Less the list we kept them in.
+    size -= sys.getsizeof(objects)
+    print('%s bytes\t%.1f' % (name, size/count))
+
+# Builtin dispatch, as the number of rows for other types grows, the way
+# hooking a builtin for each new user type would grow it.  The row that
+# matches is always last, which was the worst case for searching in order.
+def dispatch(rt):
+  integer = rt.Types.id['Integer']
+  drop = rt.rcl(['DROP']).dispatches[0]
+  calls = 100000
+  print('builtin dispatch:')
+  for rows in [1, 2, 3, 10, 100]:
+    bin = rtypes.typebin()
+    bin.argct = 2
+    bin.argck = [[1000+i, integer] for i in range(rows-1)] + [[integer, 0]]
+    bin.dispatches = [drop]*rows
+    bin.compile()
+    rt.Stack.push(rtypes.typeint(1))
+    rt.Stack.push(rtypes.typeint(2))
+    best = None
+    for i in range(REPEATS):
+      start = time.perf_counter()
+      for j in range(calls):
+        bin.eval(rt)
+      elapsed = time.perf_counter() - start
+      best = elapsed if best is None else min(best, elapsed)
+    rt.Stack.dropn(len(rt.Stack))
+    print('  %-24s %10.1f ns/call' % ('%d rows' % rows, best/calls*1e9))
+
+# Updating one element of a stored list at a time, the old way and in place,
+# for lists of a few lengths.  The old way copies the list every time.
+def put(rt):
+  writes = 2000
+  cases = [['PUT STO', "l idx #%d PUT 'l STO"],
+           ['PUT!', "'l idx #%d PUT!"]]
+  for length in [10, 1000, 100000]:
+    print('%d element list:' % length)
+    for label, text in cases:
+      rt.sto(['l'], rtypes.typelst([rtypes.typeint(0)]*length))
+      code = parse.parse(rt, ":: ':: " + text % (length//2) +
+                         " idx #1 + DUP 'idx STO #%d < ; REP ;" % writes)
+      best = None
+      for i in range(REPEATS):
+        rt.sto(['idx'], rtypes.typeint(0))
+        seconds = timed(rt, code, 1)
+        best = min(seconds, best or seconds)
+      print('  %-24s %10.1f us/write' % (label, best/writes*1e6))
+    rt.rm(['l'])
+  rt.rm(['idx'])
+
+# Stack shuffling with more and more lines sitting underneath, which ought
+# to make no difference to it at all.
+def shuffle(rt):
+  loops = 2000
+  cases = [['ROT ROTD', 'ROT ROTD'],
+           ['ROLL ROLLD', '#5 ROLL #5 ROLLD'],
+           ['DUPN DROPN', '#3 DUPN #3 DROPN'],
+           ['DUPN >LST', '#3 DUPN #3 >LST DROP']]
+  for depth in [10, 1000, 100000]:
+    print('%d lines deep:' % depth)
+    for label, text in cases:
+      code = parse.parse(rt, ":: ':: " + text +
+                         " idx #1 + DUP 'idx STO #%d < ; REP ;" % loops)
+      best = None
+      for i in range(REPEATS):
+        rt.Stack.dropn(len(rt.Stack))
+        for j in range(depth):
+          rt.Stack.push(rtypes.typeint(0))
+        rt.sto(['idx'], rtypes.typeint(0))
+        seconds = timed(rt, code, 1)
+        best = min(seconds, best or seconds)
+      print('  %-24s %10.1f us/loop' % (label, best/loops*1e6))
+  rt.Stack.dropn(len(rt.Stack))
+  rt.rm(['idx'])
+
+# Keep the parse cache somewhere of our own for a while, rather than in the
+# user's cache directory.
+@contextlib.contextmanager
+def cachedin(path):
+  saved = os.environ.get('XDG_CACHE_HOME')
+  os.environ['XDG_CACHE_HOME'] = path
+  try:
+    yield
+  finally:
+    if saved is None:
+      del os.environ['XDG_CACHE_HOME']
+    else:
+      os.environ['XDG_CACHE_HOME'] = saved
+
+# Parsing a few of our larger files, against loading what was parsed out of
+# them from the parse cache.  The cache goes in a scratch directory.
+def parsecache(rt):
+  with tempfile.TemporaryDirectory() as scratch, cachedin(scratch):
+    for name in ['colors.rpl', 'wizstat.rpl']:
+      path = os.path.join(scratch, name)
+      with open(BASDIR+name) as source, open(path, 'w') as copy:
+        text = source.read(MAXREAD)
+        copy.write(text)
+      best = {}
+      for i in range(REPEATS):
+        start = time.perf_counter()
+        token = parse.parsetoken(rt, ':: '+text+' ;')
+        obj = parse.finish(token)
+        best['parse'] = min(time.perf_counter()-start, best.get('parse', 1e9))
+        image.saveparsed(rt, path, text, obj, token.recalled)
+        start = time.perf_counter()
+        image.loadparsed(rt, path, text)
+        best['cache'] = min(time.perf_counter()-start, best.get('cache', 1e9))
+      print(name+':')
+      for label in ['parse', 'cache']:
+        print('  %-24s %10.1f ms' % (label, best[label]*1e3))
+
+# Parser throughput over every .rpl file we ship, each parsed as DSK> would
+# parse it.
+def parser(rt):
+  texts = []
+  for name in sorted(os.listdir(BASDIR)):
+    if name.endswith('.rpl'):
+      with open(BASDIR+name) as source:
+        texts += [':: '+source.read(MAXREAD)+' ;']
+  size = sum([len(i.encode()) for i in texts])
+  best = None
+  for i in range(REPEATS):
+    with quietly(rt):
+      start = time.perf_counter()
+      for text in texts:
+        parse.parse(rt, text)
+      elapsed = time.perf_counter() - start
+    best = min(elapsed, best or elapsed)
+  print('parsing %d files, %.1f KiB:' % (len(texts), size/1024))
+  print('  %-24s %10.2f MB/s' % ('throughput', size/best/1e6))
+
+# Reading a large file, opened as text and mapped into memory: all of it at
+# once, and the first few thousand lines.  Allocations are as Python sees
+# them, so the map itself doesn't count; it's the operating system's to
+# page in and out.  They're counted on a run of their own, since counting
+# them slows everything down.
+def mapread(rt):
+  size = 64
+  with tempfile.NamedTemporaryFile('w', suffix='.txt') as data:
+    line = 'a line of some data, %d\n'
+    for i in range(size*1024*1024 // len(line)):
+      data.write(line % i)
+    data.flush()
+    rt.sto(['name'], rtypes.typestr(data.name))
+    cases = [['READ everything', "#0 READ DROP"],
+             ['READL 5000 lines', "#5000 ':: h READL DROP #1 - DUP ; REP DROP"]]
+    print('%d MiB file:' % size)
+    for label, text in cases:
+      for mode in ['read', 'map']:
+        code = parse.parse(rt, ":: name \"%s\" FOPEN 'h STO h %s h FCLOSE ;"
+                               % (mode, text))
+        seconds = timed(rt, code)
+        tracemalloc.start()
+        timed(rt, code, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('  %-24s %10.1f ms  %10.1f KiB peak' %
+              (label+', '+mode, seconds*1e3, peak/1024))
+  rt.rm(['name'])
+  rt.rm(['h'])
+
+# Fixed size records out of a file: read as text a record at a time, and
+# as bytes all at once; then taking a slice out of the middle of a megabyte
+# of each, which for bytes is only a view.
+def records(rt):
+  count, size = 20000, 16
+  with tempfile.NamedTemporaryFile('wb') as data:
+    data.write(bytes(range(size))[:size] * count)
+    data.flush()
+    rt.sto(['name'], rtypes.typestr(data.name))
+    cases = [['READ, text', '"read"',
+              "#%d ':: h #%d READ DROP #1 - DUP ; REP DROP" % (count, size)],
+             ['READRECS, bytes', '"readbytes"', "h #%d #0 READRECS DROP" % size]]
+    print('%d records of %d bytes:' % (count, size))
+    for label, mode, text in cases:
+      code = parse.parse(rt, ":: name %s FOPEN 'h STO %s h FCLOSE ;" % (mode, text))
+      report(label, timed(rt, code), count)
+  rt.rm(['name'])
+  rt.rm(['h'])
+  slices = 1000
+  rt.sto(['big'], rtypes.typestr('x'*1024*1024))
+  cases = [['SUBS, string', 'big'], ['SUBS, bytes', 'big >BYTES']]
+  print('1 MiB:')
+  for label, text in cases:
+    code = parse.parse(rt, ":: %s #%d ':: #2 PICK #1 #524288 SUBS DROP #1 - DUP ; "
+                           "REP DROP DROP ;" % (text, slices))
+    report(label, timed(rt, code), slices)
+  rt.rm(['big'])
+
+# Every line of a file, the way READF used to (a READL and a + apiece), all
+# at once, and one at a time through FOREACH; against plain Python.  Copying
+# the list for each line makes the old way quadratic, so it only gets a
+# taste.
+def lines(rt):
+  count, taste = 100000, 5000
+  with tempfile.NamedTemporaryFile('w', suffix='.txt') as data:
+    for i in range(count):
+      data.write('a line of some data, %d\n' % i)
+    data.flush()
+    rt.sto(['name'], rtypes.typestr(data.name))
+    best = None
+    for i in range(REPEATS):
+      start = time.perf_counter()
+      with open(data.name) as file:
+        [line.rstrip('\n') for line in file]
+      elapsed = time.perf_counter() - start
+      if best is None or elapsed < best:
+        best = elapsed
+    print('%d lines:' % count)
+    report('Python', best, count)
+    cases = [['READL loop', 'read', taste,
+              "{ } #%d ':: h READL ROT SWAP + SWAP #1 - DUP ; REP DROP DROP"
+              % taste],
+             ['READLINES', 'read', count, "h READLINES DROP"],
+             ['READLINES, mapped', 'map', count, "h READLINES DROP"],
+             ['FOREACH', 'read', count, "h 'DROP FOREACH DROP"]]
+    for label, mode, steps, text in cases:
+      code = parse.parse(rt, ":: name \"%s\" FOPEN 'h STO %s h FCLOSE ;"
+                             % (mode, text))
+      report(label, timed(rt, code), steps)
+  rt.rm(['name'])
+  rt.rm(['h'])
+
+# Tripling ten thousand numbers: each in a list through FOREACH, and all
+# at once in an array.
+def arrays(rt):
+  count = 10000
+  run(rt, "#0 #%d #1 RANGE DUP >LST 'lst STO 'arr STO" % count)
+  cases = [['list, FOREACH', "lst ':: #3 * ; FOREACH DROP #%d >LST DROP"
+                             % count],
+           ['array', "arr #3 * DROP"]]
+  print('%d numbers:' % count)
+  for label, text in cases:
+    report(label, timed(rt, parse.parse(rt, ':: '+text+' ;')), count)
+  rt.rm(['lst'])
+  rt.rm(['arr'])
+
+# Tripling ten thousand numbers in a list: by FOREACH, which is RPL, and by
+# MAP, which isn't; next to just calling the same code as many times from a
+# REP loop.  Then FILTER and REDUCE on the same list.
+def mapping(rt):
+  count = 10000
+  run(rt, "#0 #%d #1 RANGE >LST 'lst STO" % count)
+  cases = [['REP, calls only', "#%d ':: #5 ':: #3 * ; EVAL DROP #1 - DUP ; "
+                               "REP DROP" % count],
+           ['FOREACH', "lst ':: #3 * ; FOREACH DROP #%d >LST DROP" % count],
+           ['MAP', "lst ':: #3 * ; MAP DROP"],
+           ['FILTER', "lst ':: #3 MOD ; FILTER DROP"],
+           ['REDUCE', "lst #0 ':: + ; REDUCE DROP"]]
+  print('%d items:' % count)
+  for label, text in cases:
+    report(label, timed(rt, parse.parse(rt, ':: '+text+' ;')), count)
+  rt.rm(['lst'])
+
+# Splitting a line of comma separated fields, with SPLIT as it was written
+# in RPL, a character at a time, and as it is now; against plain Python.
+# Then the rest of the string functions on the same line.
+OLDSPLIT = '''
+  ':: SWAP DUP LEN
+    '::
+      {}
+      length
+      '::
+        ':: ""
+          ':: string idx GET DUP delim ==
+            ':: DROP #0 ;
+            ':: + #1 ;
+            IFTE
+            idx #1 + DUP 'idx STO length < AND ;
+          REP + idx length < ;
+        REP ;
+      IFT ;
+    { length string delim :idx:#0 } LOCAL ;
+  {} STATIC 'oldsplit STO'''
+
+def strings(rt):
+  fields = 1000
+  line = ','.join('field%d' % i for i in range(fields))
+  run(rt, OLDSPLIT)
+  rt.sto(['line'], rtypes.typestr(line))
+  best = None
+  for i in range(REPEATS):
+    start = time.perf_counter()
+    line.split(',')
+    elapsed = time.perf_counter() - start
+    best = min(elapsed, best or elapsed)
+  print('%d fields, %d characters:' % (fields, len(line)))
+  report('Python', best, fields)
+  cases = [['RPL SPLIT', 'line "," oldsplit DROP'],
+           ['SPLIT', 'line "," SPLIT DROP'],
+           ['SPLIT JOIN', 'line "," SPLIT ";" JOIN DROP'],
+           ['FIND', 'line "field999" FIND DROP'],
+           ['REPLACE', 'line "field" "f" REPLACE DROP'],
+           ['UPPER', 'line UPPER DROP']]
+  for label, text in cases:
+    report(label, timed(rt, parse.parse(rt, ':: '+text+' ;')), fields)
+  rt.rm(['line'])
+  rt.rm(['oldsplit'])
+
+# Throwing out duplicates, from a list with HAS and into a set, and counting
+# how often each word comes up in a map, at a few sizes.  Each word comes up
+# four times.  The set and map should take about twice as long for twice the
+# words, and the list four times as long.
+def maps(rt):
+  cases = [['list, HAS', "words {} ':: DUP2 HAS ':: DROP ; ':: #1 >LST + ; "
+                         "IFTE ; REDUCE DROP"],
+           ['set', "words {} >SET ':: + ; REDUCE DROP"],
+           ['map, counting', "words {} >MAP ':: DUP2 HAS "
+                             "':: DUP2 GET #1 + SWAP PUT ; "
+                             "':: #1 SWAP PUT ; IFTE ; REDUCE DROP"]]
+  for count in [1000, 2000, 4000]:
+    words = ['word%d' % (i % (count//4)) for i in range(count)]
+    rt.sto(['words'], rtypes.typelst([rtypes.typestr(i) for i in words]))
+    print('%d words, %d different:' % (count, count//4))
+    for label, text in cases:
+      report(label, timed(rt, parse.parse(rt, ':: '+text+' ;'), 3), count)
+  rt.rm(['words'])
+
+# Sorting numbers, with an insertion sort written in RPL out of GET and PUT,
+# with SORT, and with SORTBY by their negatives; against plain Python.
+OLDSORT = '''
+  ':: DUP LEN
+    '::
+      '::
+        lst i GET 'v STO i 'j STO
+        '::
+          j #0 > ':: lst j #1 - GET v > ; #0 IFTE
+          ':: lst lst j #1 - GET j PUT 'lst STO j #1 - 'j STO #1 ; #0 IFTE ;
+        REP
+        lst v j PUT 'lst STO
+        i #1 + DUP 'i STO n < ;
+      n #1 > 'REP 'DROP IFTE lst ;
+    { n lst :i:#1 :j:#0 :v:#0 } LOCAL ;
+  {} STATIC 'oldsort STO'''
+
+def sorting(rt):
+  run(rt, OLDSORT)
+  for count in [250, 1000]:
+    numbers = [(i*7919) % count for i in range(count)]
+    rt.sto(['numbers'], rtypes.typelst([rtypes.typeint(i) for i in numbers]))
+    best = None
+    for i in range(REPEATS):
+      start = time.perf_counter()
+      sorted(numbers)
+      elapsed = time.perf_counter() - start
+      best = min(elapsed, best or elapsed)
+    print('%d numbers:' % count)
+    report('Python', best, count)
+    cases = [['RPL insertion sort', 'numbers oldsort DROP'],
+             ['SORT', 'numbers SORT DROP'],
+             ['SORTBY', "numbers ':: #0 SWAP - ; SORTBY DROP"]]
+    for label, text in cases:
+      report(label, timed(rt, parse.parse(rt, ':: '+text+' ;'), 3), count)
+  rt.rm(['numbers'])
+  rt.rm(['oldsort'])
+
+# Lots of little DISPNs, the way a stack gets shown after every line at the
+# REPL, into a stand-in for a terminal which counts how often it's written
+# to: every scrap as it comes, a line at a time, and in big chunks.
+class console(io.TextIOBase):
+  def __init__(self):
+    self.writes = 0
+  def write(self, text):
+    self.writes += 1
+    return len(text)
+
+def output(rt):
+  text = ("#200 ':: #20 ':: \"item\" DISPN #1 - DUP ; REP DROP "
+          "\"\" DISP #1 - DUP ; REP DROP")
+  code = parse.parse(rt, ':: '+text+' ;')
+  cases = [['every scrap', 0, False], ['line at a time', OUTBUFFER, True],
+           ['buffered', OUTBUFFER, False]]
+  print('4000 DISPNs, 200 lines:')
+  for label, size, linewise in cases:
+    runtime.OUTBUFFER, rt.Linewise = size, linewise
+    tty = console()
+    with contextlib.redirect_stdout(tty):
+      seconds = timed(rt, code)
+      rt.flush()
+    print('  %-24s %10.1f ms  %8d writes' %
+          (label, seconds*1e3, tty.writes/REPEATS))
+  runtime.OUTBUFFER, rt.Linewise = OUTBUFFER, False
+
+# Booting, and then looking up a name from each module that boot put off
+# loading, which is where the time saved at boot goes instead.
+def autoload(rt):
+  with quietly():
+    start = time.perf_counter()
+    booted = boot()
+    elapsed = time.perf_counter() - start
+  print('booting modules.rpl:')
+  print('  %-24s %10.1f ms' % ('boot', elapsed*1e3))
+  for name in ['>TYPE', 'ANSI']:
+    with quietly(booted):
+      start = time.perf_counter()
+      booted.autoload(booted.rcl([name]))
+      elapsed = time.perf_counter() - start
+    print('  %-24s %10.1f ms' % ('first '+name, elapsed*1e3))
+
+benchmarks = {'threadcode': threadcode, 'memory': memory,
+              'dispatch': dispatch, 'put': put,
+              'shuffle': shuffle, 'parsecache': parsecache,
+              'autoload': autoload, 'parser': parser, 'mapread': mapread,
+              'records': records, 'lines': lines, 'output': output,
+              'arrays': arrays, 'mapping': mapping, 'strings': strings,
+              'maps': maps, 'sorting': sorting}
+
+if __name__ == '__main__':
+  ourRT = boot()
+  for i in sys.argv[1:] or list(benchmarks):
+    if i in benchmarks:
+      benchmarks[i](ourRT)
+    else:
+      print('There is no benchmark called', i)
@@ -0,0 +1,236 @@
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Boot images and the parse cache
+
+# Booting parses and runs every module in modules.rpl, which is most of the
+# time it takes to start up.  Instead, boot.rpl asks for a snapshot once the
+# modules are in: the whole runtime, named store, Types registry, stack and
+# contexts, pickled just as it is.  Next time around rpl.py can load that
+# and carry on from the same spot in boot.rpl, as though it had just come
+# back from taking the snapshot.
+
+# An image remembers the contents of every file DSK> parsed on the way, and
+# of our own Python, and is only any good while they're all still the same.
+# Otherwise we boot the long way, and the long way takes a new snapshot.
+
+# On a smaller scale, DSK> keeps what it parsed out of each file, and uses
+# that instead of parsing the file again if it hasn't changed.
+
+from trivia import *
+import parse, rtypes, runtime, internals
+
+import sys, os, io, types, pickle, hashlib, contextlib
+
+# Change this if images are ever laid out differently.
+IMAGEVERSION = 1
+
+# Where we live, which is where the boot image lives too, rather than
+# wherever we were started from: loading an image runs whatever it says to,
+# so it had better be ours.
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMAGEPATH = os.path.join(HERE, BOOTIMAGE) if BOOTIMAGE else None
+
+# The Python which shapes what goes into an image.  rpl.py isn't imported
+# but run, so it's named by its path; it sets up the runtime before boot.rpl
+# gets to it, which an image skips, so a change there means a new image.
+MODULES = [sys.modules[__name__], parse, rtypes, runtime, internals,
+           sys.modules['trivia']]
+SCRIPTS = [os.path.join(HERE, 'rpl.py')]
+
+# Directories are linked lists, and pickle takes them one link at a time.
+DEPTH = 100000
+
+@contextlib.contextmanager
+def deeply():
+  limit = sys.getrecursionlimit()
+  sys.setrecursionlimit(DEPTH)
+  try:
+    yield
+  finally:
+    sys.setrecursionlimit(limit)
+
+def digest(data):
+  return hashlib.sha1(data).hexdigest()
+
+# A digest for each file we depend upon.  Missing files just get None.
+def fingerprint(paths):
+  prints = {}
+  for i in sorted(paths):
+    try:
+      with open(i, 'rb') as file:
+        prints[i] = digest(file.read())
+    except OSError:
+      prints[i] = None
+  return prints
+
+def sources(rt):
+  return list(rt.Sources) + [i.__file__ for i in MODULES] + SCRIPTS
+
+
+# Internals are closures within makebinprocs, so they can't be pickled
+# as themselves.  They're written down by name and looked up again when
+# loading.  That's only the internals themselves, though.  The steps some
+# of them make to run (see stepper) are closures too, with no name to look
+# them up by, so a runtime in the middle of one can't be saved.
+
+# When we pickle less than a whole runtime, the runtime's own fixtures are
+# written down by name as well, and so is anything out of its named store
+# that we've been asked to leave there.
+FIXTURES = ['Return', 'lastobj', 'nulltag']
+
+class pickler(pickle.Pickler):
+  def __init__(self, file, rt=None, recalled=[]):
+    super().__init__(file, pickle.HIGHEST_PROTOCOL)
+    self.fixtures = {}
+    if rt is not None:
+      for i in FIXTURES:
+        self.fixtures[id(getattr(rt, i))] = ('fixture', i)
+    for n, i in enumerate(recalled):
+      self.fixtures[id(i)] = ('recalled', n)
+
+  def persistent_id(self, obj):
+    if type(obj) is types.FunctionType:
+      name = internals.MADE.get(obj)
+      if name is not None:
+        return ('internal', name)
+      if obj.__qualname__.startswith(internals.makebinprocs.__name__+'.'):
+        raise pickle.PicklingError(obj.__qualname__+' is part of an '
+                                   'internal at work, and only internals '
+                                   'themselves can be saved')
+    return self.fixtures.get(id(obj))
+
+class unpickler(pickle.Unpickler):
+  def __init__(self, file, rt=None):
+    super().__init__(file)
+    self.rt = rt
+    self.internals = dict(internals.makebinprocs())
+
+  def persistent_load(self, pid):
+    kind, name = pid
+    if kind == 'internal':
+      return self.internals[name]
+    return getattr(self.rt, name)
+
+
+# Save a runtime.  If anything in it can't be pickled (an open file handle
+# left lying around, perhaps) there's simply no image this time.
+def save(rt, path):
+  try:
+    with deeply(), open(path, 'wb') as file:
+      pickle.dump((IMAGEVERSION, fingerprint(sources(rt))), file)
+      pickler(file).dump(rt)
+    return True
+  except Exception:
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+    return False
+
+# Load a runtime, or return None if there is no image or it's out of date.
+def load(path):
+  try:
+    with deeply(), open(path, 'rb') as file:
+      version, prints = pickle.load(file)
+      if version != IMAGEVERSION or \
+         prints != fingerprint(list(prints)):
+        return
+      rt = unpickler(file).load()
+  except Exception:
+    return
+  # Type numbers belong to the classes, which the image only refers to.
+  for i in rt.Types.parsetypes:
+    i.typenum = rt.Types.id[i.typename]
+  return rt
+
+
+# #####################################################
+# Parse cache
+
+# What DSK> parsed out of each file is kept in a directory of the user's own
+# (under XDG_CACHE_HOME, or ~/.cache), filed by a digest of the file's full
+# path, along with a digest of what the file said.
+
+def cachedir():
+  base = os.environ.get('XDG_CACHE_HOME') or \
+         os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(base, PARSECACHE)
+
+def cachepath(path):
+  return os.path.join(cachedir(), digest(os.path.abspath(path).encode()))
+
+# It's pickled, since nothing else we could read back in Python comes out
+# ahead of just parsing again.  But unpickling will do whatever it's told,
+# so this one will only make what the parser could have made itself, out of
+# the types with parsers of their own, and otherwise only hands out the
+# runtime's fixtures and what was recalled at parse time.  A cache file can
+# say no more than the source it came from.
+class cacheunpickler(pickle.Unpickler):
+  def __init__(self, file, rt, recalled):
+    super().__init__(file)
+    self.rt = rt
+    self.recalled = recalled
+    self.parsed = dict([(i.__name__, i) for i in rt.Types.parsetypes
+                        if 'parse' in vars(i)])
+
+  def find_class(self, module, name):
+    if module == rtypes.__name__ and name in self.parsed:
+      return self.parsed[name]
+    raise pickle.UnpicklingError(module+'.'+name+' is no business of a '
+                                 'parse cache')
+
+  def persistent_load(self, pid):
+    kind, name = pid
+    if kind == 'fixture' and name in FIXTURES:
+      return getattr(self.rt, name)
+    elif kind == 'recalled':
+      return self.recalled[name]
+    raise pickle.UnpicklingError('Only fixtures and recalled objects are '
+                                 'any business of a parse cache')
+
+# Objects recalled at parse time (with backquotes) were part of what the
+# parser made, so if any of them is now something else, so would be a fresh
+# parse.  We compare them by digests of their pickles.
+def signature(rt, obj):
+  file = io.BytesIO()
+  with deeply():
+    pickler(file, rt).dump(obj)
+  return digest(file.getvalue())
+
+# Save what was parsed from the text of a file.  Recalled is the token's list
+# of alternate mode symbols and the objects they got.  Nothing much matters
+# if we can't.
+def saveparsed(rt, path, text, obj, recalled):
+  if not PARSECACHE:
+    return
+  names = [i[0] for i in recalled]
+  objects = [i[1] for i in recalled]
+  cache = cachepath(path)
+  try:
+    os.makedirs(cachedir(), mode=0o700, exist_ok=True)
+    with deeply(), open(cache+'.new', 'wb') as file:
+      pickle.dump((IMAGEVERSION, digest(text.encode()), names,
+                   [signature(rt, i) for i in objects]), file)
+      pickler(file, rt, objects).dump(obj)
+    os.replace(cache+'.new', cache)
+  except Exception:
+    pass
+
+# Load what was parsed from the text of a file, as long as it was the same
+# text, and the symbols it recalled at parse time still get the same things.
+# Otherwise (or if there's no cache) return None.
+def loadparsed(rt, path, text):
+  if not PARSECACHE:
+    return
+  try:
+    with deeply(), open(cachepath(path), 'rb') as file:
+      version, prints, names, signatures = cacheunpickler(file, rt, []).load()
+      if version != IMAGEVERSION or prints != digest(text.encode()):
+        return
+      objects = [rt.rcl(i) for i in names]
+      for obj, sig in zip(objects, signatures):
+        if obj is None or signature(rt, obj) != sig:
+          return
+      return cacheunpickler(file, rt, objects).load()
+  except Exception:
+    return
@@ -14,9 +14,9 @@
 
 from trivia import *
 from runtime import ret
-import rtypes, parse
+import rtypes, parse, image
 
-import time, random, copy
+import time, random, copy, sys, math, weakref
 
 # Windows doesn't include readline for some stupid reason
 try:
@@ -25,6 +25,41 @@ except:
   print("\n** Windows scrubs don't get nice editing keys **\n")
 
 
+# Lists, arrays, maps and sets are values, so whatever changes one changes a
+# copy, unless nobody else can possibly see it, in which case it might as
+# well change it in place.  Python knows who can see it: it counts the
+# references to an object, and an object only the caller's own variables
+# (or whatever the caller knows it's stored in) refer to, expected of them
+# in all, came off the stack and is nowhere else.  Nor can anything else be
+# holding the Python list (or whatever) inside it, which is what actually
+# gets changed.
+
+# That's CPython, which counts every reference as it's made and forgotten.
+# What being handed to us (and to getrefcount) adds to the count depends on
+# how CPython calls functions, so it's measured, as ONLYREF, on an object
+# only one variable holds, the same way refs counts it.  Anywhere that
+# isn't CPython, counts can't be taken at their word, and everything is
+# taken to be shared, and copied.
+CPYTHON = sys.implementation.name == 'cpython'
+
+def unshared(obj, expected=1):
+  return CPYTHON and sys.getrefcount(obj) <= ONLYREF+expected-1 and \
+         refs(obj.data) <= ONLYREF
+
+def refs(obj):
+  return sys.getrefcount(obj)
+
+def onlyref():
+  obj = object()
+  return refs(obj)
+ONLYREF = onlyref()
+
+
+# Every function makebinprocs has made, and the name of the internal it is,
+# so image.py can tell an internal from any other function, such as one of
+# the steps an internal makes for itself.
+MADE = weakref.WeakKeyDictionary()
+
 # Build a list of anonymous functions, each entry being [name, function].
 
 # No, it is not ironic or contradictory for functions to be both named
@@ -108,12 +143,28 @@ def makebinprocs():
     
   ### Input/Output
   
-  # Open file.
+  # File modes, as FOPEN knows them, and as Python does.
+  modes = {'read': 'r', 'write': 'w', 'append': 'a', 'map': 'map',
+           'readbytes': 'rb', 'writebytes': 'wb', 'appendbytes': 'ab'}
+  def x(rt):
+    mode = rt.Stack.pop()
+    if not mode.data in modes:
+      rt.Stack.push(mode)
+      return rt.ded('A file can only be "'+'", "'.join(list(modes)[:-1])+
+                    '", or "'+list(modes)[-1]+'"')
+    rt.Stack.push(rtypes.typestr(modes[mode.data]))
+    return rt.Context.eval
+  bins += [['filemode', x]]
+
+  # Open file.  Mode 'map' maps it into memory for reading instead.
   def x(rt):
     options = rt.Stack.pop()
     filename = rt.Stack.pop()
     try:
-      rt.Stack.push(rtypes.typeio(open(filename.data, options.data)))
+      if options.data == 'map':
+        rt.Stack.push(rtypes.typeio(rtypes.mappedfile(filename.data), rt))
+      else:
+        rt.Stack.push(rtypes.typeio(open(filename.data, options.data), rt))
     except:
       rt.Stack.push(filename)
       rt.Stack.push(options)
@@ -140,33 +191,117 @@ def makebinprocs():
     return rt.Context.eval
   bins += [['fclose', x]]
   
+  # Text files give us strings, binary ones bytes.
+  def readout(data):
+    if isinstance(data, bytes):
+      return rtypes.typebytes(data)
+    return rtypes.typestr(data)
+
   # Read line from file, but strip newline.
   def x(rt):
     handle = rt.Stack.pop()
     try:
+      if handle.data.__class__ is rtypes.mappedfile:
+        string = handle.data.readline()
+        if string is None:
+          handle.eof = True
+          string = rtypes.typestr('')
+        rt.Stack.push(string)
+        return rt.Context.eval
       string = handle.data.readline(MAXREAD)
       if not len(string):
         handle.eof = True
-      rt.Stack.push(rtypes.typestr(string.rstrip('\n')))
+      if isinstance(string, bytes):
+        rt.Stack.push(readout(string.rstrip(b'\n')))
+      else:
+        rt.Stack.push(readout(string.rstrip('\n')))
     except:
       rt.Stack.push(handle)
       return rt.ded('You may read a book, but not this file')
     return rt.Context.eval
   bins += [['freadline', x]]
   
-  # Read some number of characters from a file.
+  # The next line of a file, without its newline, or None if there are no
+  # more.  Unlike freadline, this doesn't make up an empty last line.
+  def nextline(handle):
+    string = handle.data.readline()
+    if string is None or string in ('', b''):
+      handle.eof = True
+      return None
+    if string.__class__ is rtypes.typeview:
+      return string
+    if isinstance(string, bytes):
+      return readout(string.rstrip(b'\n'))
+    return readout(string.rstrip('\n'))
+
+  # FOREACH for a file: evaluate something with each line left in it on the
+  # stack, reading them as we go, then return the file.  Like stream>, this
+  # runs as a code object of its own which backs up to its first step after
+  # each line.
+  def x(rt):
+    evaluator = rt.Stack.pop()
+    handle = rt.Stack.pop()
+    caller = rt.Caller
+    def step(rt):
+      try:
+        string = nextline(handle)
+      except:
+        rt.Stack.push(handle)
+        rt.Caller = caller
+        return rt.ded('You may read a book, but not this file')
+      if string is None:
+        rt.Stack.push(handle)
+        return rt.Context.eval
+      rt.Stack.push(string)
+      rt.Context.ip -= 1
+      return evaluator.eval
+    return rtypes.typecode([rtypes.typebinproc(step), rt.Return]).eval
+  bins += [['foreachline', x]]
+
+  # Read all the lines left in a file into a list, without newlines.  A
+  # newline at the very end doesn't start another line.
+  def x(rt):
+    handle = rt.Stack.pop()
+    try:
+      if handle.data.__class__ is rtypes.mappedfile:
+        lines = handle.data.readlines()
+      else:
+        data = handle.data.read()
+        if isinstance(data, bytes):
+          lines, kind = data.split(b'\n'), rtypes.typebytes
+        else:
+          lines, kind = data.split('\n'), rtypes.typestr
+        if not lines[-1]:
+          lines.pop()
+        lines = [kind(i) for i in lines]
+      handle.eof = True
+    except:
+      rt.Stack.push(handle)
+      return rt.ded('You may read a book, but not this file')
+    rt.Stack.push(rtypes.typelst(lines))
+    return rt.Context.eval
+  bins += [['freadlines', x]]
+
+  # Read some number of characters from a file, or the rest of it.
   def x(rt):
     chars = rt.Stack.pop()
     handle = rt.Stack.pop()
+    mapped = handle.data.__class__ is rtypes.mappedfile
     try:
-      if chars.data > 0 and chars.data < MAXREAD:
-        string = handle.data.read(chars.data)
-        if len(string)<chars.data:
+      if chars.data > 0:
+        if mapped:
+          string = handle.data.read(chars.data)
+        else:
+          string = readout(handle.data.read(chars.data))
+        if len(string.data)<chars.data:
           handle.eof = True
       else:
-        rt.Stack.push(rtypes.typestr(handle.data.read(MAXREAD)))
-        if len(string)<MAXREAD:
-          handle.eof = True
+        if mapped:
+          string = handle.data.readall()
+        else:
+          string = readout(handle.data.read())
+        handle.eof = True
+      rt.Stack.push(string)
     except:
       rt.Stack.push(handle)
       rt.Stack.push(chars)
@@ -174,6 +309,73 @@ def makebinprocs():
     return rt.Context.eval
   bins += [['fread', x]]
 
+  # Read some number of fixed size records from a binary file, or all the
+  # rest of them, as a list of Bytes.  They're all views of the one read,
+  # and the last may come up short if the file does.
+  def x(rt):
+    count = rt.Stack.pop()
+    size = rt.Stack.pop()
+    handle = rt.Stack.pop()
+    if size.data < 1:
+      rt.Stack.push(handle)
+      rt.Stack.push(size)
+      rt.Stack.push(count)
+      return rt.ded('Records take up some room, as a rule')
+    try:
+      if count.data > 0:
+        data = handle.data.read(size.data*count.data)
+        if len(data) < size.data*count.data:
+          handle.eof = True
+      else:
+        data = handle.data.read()
+        handle.eof = True
+      if not isinstance(data, bytes):
+        raise TypeError
+    except:
+      rt.Stack.push(handle)
+      rt.Stack.push(size)
+      rt.Stack.push(count)
+      return rt.ded('Only a binary file keeps records')
+    data = memoryview(data)
+    rt.Stack.push(rtypes.typelst([rtypes.typebytes(data[i:i+size.data])
+                                  for i in range(0, len(data), size.data)]))
+    return rt.Context.eval
+  bins += [['freadrecs', x]]
+
+  # Write a list of Bytes to a binary file, one after the other.
+  def x(rt):
+    handle = rt.Stack.pop()
+    lst = rt.Stack.pop()
+    bytestype = rt.Types.id['Bytes']
+    try:
+      for i in lst.data:
+        if i.typenum != bytestype:
+          raise TypeError
+      handle.data.writelines([i.data for i in lst.data])
+    except:
+      rt.Stack.push(lst)
+      rt.Stack.push(handle)
+      return rt.ded('Only Bytes go on the record, and only into a binary file')
+    return rt.Context.eval
+  bins += [['fwriterecs', x]]
+
+  # Write a list of strings to a file, each as a line.
+  def x(rt):
+    handle = rt.Stack.pop()
+    lst = rt.Stack.pop()
+    strtype = rt.Types.id['String']
+    try:
+      for i in lst.data:
+        if i.typenum != strtype:
+          raise TypeError
+      handle.data.writelines([i.data+'\n' for i in lst.data])
+    except:
+      rt.Stack.push(lst)
+      rt.Stack.push(handle)
+      return rt.ded('You may write a friend, but not this file')
+    return rt.Context.eval
+  bins += [['fwritelines', x]]
+
   # Write a line to a file, no newline.
   def x(rt):
     handle = rt.Stack.pop()
@@ -203,18 +405,25 @@ def makebinprocs():
   
   # Display.
   def x(rt):
-    print(rt.Stack.pop().data)
+    rt.write(str(rt.Stack.pop().data)+'\n')
     return rt.Context.eval
   bins += [['disp', x]]
   
   # Display;.
   def x(rt):
-    print(rt.Stack.pop().data, end="")
+    rt.write(str(rt.Stack.pop().data))
     return rt.Context.eval
   bins += [['dispn', x]]
 
+  # Write out whatever's been displayed so far.
+  def x(rt):
+    rt.flush()
+    return rt.Context.eval
+  bins += [['flush', x]]
+
   # Console input.
   def x(rt):
+    rt.flush()
     rt.dieanyway = True
     x = rt.Stack.pop()
     try:
@@ -255,9 +464,15 @@ def makebinprocs():
       rt.Stack.push(lines)
       return rt.ded('That is not a reasonable number of lines to drop')
     else:
-      rt.Stack.data = rt.Stack.data[:len(rt.Stack.data)-lines.data]
+      rt.Stack.dropn(lines.data)
     return rt.Context.eval
   bins += [['dropn', x]]
+
+  # Count lines.
+  def x(rt):
+    rt.Stack.push(rtypes.typeint(len(rt.Stack.data)))
+    return rt.Context.eval
+  bins += [['lines', x]]
   
   # Pick a line.
   def x(rt):
@@ -285,19 +500,19 @@ def makebinprocs():
   
   # Duplicate.
   def x(rt):
-    rt.Stack.data += rt.Stack.data[len(rt.Stack.data)-1:]
+    rt.Stack.dupn(1)
     return rt.Context.eval
   bins += [['dup', x]]
   
   def x(rt):
-    rt.Stack.data += rt.Stack.data[len(rt.Stack.data)-2:]
+    rt.Stack.dupn(2)
     return rt.Context.eval
   bins += [['dup2', x]]
   
   def x(rt):
     count = rt.Stack.pop()
     if len(rt.Stack.data)>=count.data>0:
-      rt.Stack.data += rt.Stack.data[len(rt.Stack.data)-count.data:]
+      rt.Stack.dupn(count.data)
     else:
       rt.Stack.push(count)
       return rt.ded('Duplicate how many things now')
@@ -306,15 +521,12 @@ def makebinprocs():
   
   # Rotate.
   def x(rt):
-    splice = len(rt.Stack.data)-3
-    rt.Stack.data[splice:] = rt.Stack.data[splice+1:] + [rt.Stack.data[splice]]
+    rt.Stack.roll(3)
     return rt.Context.eval
   bins += [['rot', x]]
 
   def x(rt):  
-    splice = len(rt.Stack.data)-3
-    last = len(rt.Stack.data)-1
-    rt.Stack.data[splice:] = [rt.Stack.data[last]] + rt.Stack.data[splice:last] 
+    rt.Stack.rolld(3)
     return rt.Context.eval
   bins += [['rotd', x]]  
   
@@ -325,8 +537,7 @@ def makebinprocs():
       rt.Stack.push(qty)
       return rt.ded('Your katamari is not big enough to roll this much')
     elif qty.data>0:
-      splice = len(rt.Stack.data)-qty.data
-      rt.Stack.data[splice:] = rt.Stack.data[splice+1:] + [rt.Stack.data[splice]]
+      rt.Stack.roll(qty.data)
     return rt.Context.eval
   bins += [['roll', x]]
                    
@@ -336,9 +547,7 @@ def makebinprocs():
       rt.Stack.push(qty)
       return rt.ded('Your katamari is not big enough to roll this much')
     elif qty.data>0:
-      splice = len(rt.Stack.data)-qty.data
-      last = len(rt.Stack.data)-1
-      rt.Stack.data[splice:] = [rt.Stack.data[last]] + rt.Stack.data[splice:last] 
+      rt.Stack.rolld(qty.data)
     return rt.Context.eval
   bins += [['rolld', x]]
 
@@ -354,19 +563,85 @@ def makebinprocs():
   ### Disk store
 
   # Parse an entire file as a code object.
+  # If the file hasn't changed since last time, we may have already parsed it;
+  # see image.py.  We don't keep what we parse if the parser only got partway
+  # through, so it can complain every time.
   def x(rt):
     name = rt.Stack.pop()
     try:
       with open(name.data, 'r') as file:
-        text = ':: '+file.read(MAXREAD)+' ;'
+        text = file.read(MAXREAD)
     except:
       rt.Stack.push(name)
       return rt.ded('The operating system says no')
-    obj = parse.parse(rt, text)
+    obj = image.loadparsed(rt, name.data, text)
     if obj is None:
-      return rt.ded('The parser did not care for your shenanigans')
+      token = parse.parsetoken(rt, ':: '+text+' ;')
+      obj = parse.finish(token)
+      if obj is None:
+        return rt.ded('The parser did not care for your shenanigans')
+      if token.stop:
+        image.saveparsed(rt, name.data, text, obj, token.recalled)
+    rt.Sources.add(name.data)
     return obj.eval
   bins += [['dsk>', x]]
+
+  # Or parse a file one object at a time, evaluating each as soon as we have
+  # it, so the file can be as big as it likes.  This runs as a code object of
+  # its own, whose first step fetches the next object and backs up to fetch
+  # another once that's done.
+  def x(rt):
+    name = rt.Stack.pop()
+    try:
+      file = open(name.data, 'r')
+    except:
+      rt.Stack.push(name)
+      return rt.ded('The operating system says no')
+    stream = parse.parsestream(rt, file)
+    caller = rt.Caller
+    def step(rt):
+      obj = stream.next()
+      if obj is None:
+        if stream.failed:
+          rt.Caller = caller
+          return rt.ded('The parser did not care for your shenanigans')
+        return rt.Context.eval
+      rt.Context.ip -= 1
+      return obj.eval
+    return rtypes.typecode([rtypes.typebinproc(step), rt.Return]).eval
+  bins += [['stream>', x]]
+
+  # Take a boot image, if we're set up to.  See image.py.
+  def x(rt):
+    if BOOTIMAGE:
+      rt.flush()
+      image.save(rt, image.IMAGEPATH)
+    return rt.Context.eval
+  bins += [['snapshot', x]]
+
+  # Put off loading some modules until a name they define is evaluated.  Takes
+  # a list of module names (as in modules.rpl) and of the names they'll
+  # store, and stores an autoload stub under each of the latter.  See
+  # rplruntime.autoload.
+  def x(rt):
+    lst = rt.Stack.pop()
+    paths, names = [], []
+    for i in lst.data:
+      if i.typenum == rt.Types.id['String']:
+        paths += [BASDIR+i.data+'.rpl']
+      elif i.typenum == rt.symtype and len(i.data) == 1:
+        names += [i.data[0]]
+      elif i.typenum != rt.Types.id['Comment']:
+        rt.Stack.push(lst)
+        return rt.ded('Modules have names, and the names in them are plain '
+                      'symbols, and that is neither')
+    # The modules are as much a part of a boot image as the ones we loaded.
+    rt.Sources.update(paths)
+    loader = rt.rcl([INTERNALSDIR, 'dsk>'])
+    for i in names:
+      rt.sto([i], rtypes.typestub(paths, names, loader, i))
+    return rt.Context.eval
+  bins += [['autoload', x]]
   
 
   ### Named storage
@@ -424,6 +699,9 @@ def makebinprocs():
   def x(rt):
     tag = rt.Stack.pop()
     thing = rt.Stack.pop()
+    # The tag may be a directory entry somebody's dotted name runs through.
+    if tag.obj.typenum == rt.dirtype or thing.typenum == rt.dirtype:
+      rt.Generation += 1
     if thing.typenum == rt.symtype:
       original = tag.obj
       tag.obj = thing
@@ -508,23 +786,17 @@ def makebinprocs():
   
   # Local variable context.
   def x(rt):
-    # In case of emergency, pull this lever and return.
+    # In case of emergency, put back what we took and complain.
     def usded(reason):
       rt.Context = origcontext
-      rt.Stack.data = origstack
+      rt.Stack.data += taken[::-1] + [prog, names]
       return rt.ded(reason)
       
-    # Hang onto our whole stack and our current context.
-    origstack = rt.Stack.data[:]
+    # Hang onto our current context, and whatever we take off the stack.
     origcontext = rt.Context
-    
-    # Make a new temporary context for purposes of checking for circulation.
-    # In the future, it might make more sense, and be a lot faster, to just
-    # not check for circulation at all, now that such a reference will softly
-    # hang the inner loop instead of crashing all the way out of Python.
-    names = rt.Stack.pop().data
+    names = rt.Stack.pop()
     prog = rt.Stack.pop()
-    rt.Context = rtypes.typecontext(prog, origcontext.names)
+    taken = []
     nextob = origcontext.names
     
     dirtype = rt.dirtype
@@ -532,7 +804,7 @@ def makebinprocs():
     comtype = rt.Types.id['Comment']
     symtype = rt.symtype
     
-    for i in names:
+    for i in names.data:
       if i.typenum == symtype:
         # If it's a symbol, verify it's a valid one.
         if len(i.data)>1:
@@ -540,34 +812,39 @@ def makebinprocs():
         # Try popping an object off the stack and assigning it to a name.
         thisob = rt.Stack.pop()
         if thisob is not None:
+          taken.append(thisob)
           nextob = rtypes.typedir(rtypes.typetag(i.data[0], thisob), nextob)
           circname = i.data
         else:
-          return usded('You gotta have '+str(len(names))+' things on the stack!')
+          return usded('You gotta have '+str(len(names.data))+' things on the stack!')
       elif i.typenum == tagtype:
         # Tags are copied and assigned without pulling anything off the stack.
         circname = [i.name]
         nextob = rtypes.typedir(i.cp(), nextob)
       elif i.typenum == comtype:
-        # Comments are suppressed (this repeats last circulation check.)
-        pass
+        # Comments are suppressed.
+        continue
       else:
-        usded("Only symbols and tags lead to success")
-      # Check for circular references as we go.
-      rt.Context.names = nextob
-      if nextob.tag.obj.typenum == symtype:
+        return usded("Only symbols and tags lead to success")
+      # Check for circular references as we go.  Only symbols and directories
+      # can circulate, so only they need a temporary context with our names
+      # so far in place.
+      obj = nextob.tag.obj
+      if obj.typenum == symtype:
+        rt.Context = rtypes.typecontext(prog, nextob)
         if rt.circsym(circname):
           return usded('Round and round the '+rtypes.symtostr(circname)+' bush the '+
                 rtypes.symtostr(circname)+' chased the '+rtypes.symtostr(circname))
-      elif nextob.tag.obj.typenum==dirtype:
-        if rt.circdir(nextob.tag.obj):
+        rt.Context = origcontext
+      elif obj.typenum == dirtype:
+        rt.Context = rtypes.typecontext(prog, nextob)
+        if rt.circdir(obj):
           return usded('This directory circulates if you put it there')
-    # And queue a new local variable context.
-    
-    # Two ways to call: one if we stored no names, the other if we did.
-    # Restore our original context first, discarding the test context.
-    nextob = rt.Context.names
-    rt.Context = origcontext
+        rt.Context = origcontext
+
+    # And queue a new local variable context.  Two ways to call: one if we
+    # stored no names, the other if we did, in which case newlocall gives the
+    # frame a first entry indexing our names.
     if nextob is origcontext.names:
       return rt.newcall(prog)
     else:
@@ -610,7 +887,7 @@ def makebinprocs():
       ret(rt)
     ret(rt)
     # Suppress any premature notions that we're done here.
-    rt.Running = True
+    rt.resume()
     return rt.Stack.pop().eval
   bins += [['beval', x]]
 
@@ -694,6 +971,13 @@ def makebinprocs():
     rt.Stack.push(rtypes.typestr(y+x))
     return rt.Context.eval
   bins += [['+str', x]]
+
+  def x(rt):
+    x = rt.Stack.pop().data
+    y = rt.Stack.pop().data
+    rt.Stack.push(rtypes.typebytes(bytes(y)+bytes(x)))
+    return rt.Context.eval
+  bins += [['+bytes', x]]
   
   def x(rt):
     src = rt.Stack.pop()
@@ -896,16 +1180,17 @@ def makebinprocs():
   # to builtin (add dispatch table later with binhook)
   def x(rt):
     newbin = rtypes.typebin()
-    oldstack = rt.Stack.data[:]
+    args = rt.Stack.take(3)
     # Don't let user get fresh with dotted names
-    newbin.data = rt.Stack.pop().data[0]
-    newbin.hint = rt.Stack.pop().data
-    newbin.argct = rt.Stack.pop().data
+    newbin.data = args[2].data[0]
+    newbin.hint = args[1].data
+    newbin.argct = args[0].data
     newbin.dispatches = []
     newbin.argck = [] 
     if newbin.argct < 0:
-      rt.Stack.data = oldstack
+      rt.Stack.data += args
       return rt.ded("It's hard to win a negative argument")
+    newbin.compile()
     rt.Stack.push(newbin)
     return rt.Context.eval
   bins += [['>bin', x]]
@@ -938,12 +1223,17 @@ def makebinprocs():
       for j in range(ourbin.argct):
         argck += [i.data[j+1].data]
       ourbin.argck += [argck]        
+    ourbin.compile()
     return rt.Context.eval
   bins += [['setdispatch', x]]
         
   # Hook new dispatch lines into an extant builtin.
   def x(rt):
-    oldstack = rt.Stack.data[:]
+    def usded(reason):
+      rt.Stack.push(patches)
+      rt.Stack.push(bin)
+      return rt.ded(reason)
+
     bin = rt.Stack.pop()
     patches = rt.Stack.pop()
     
@@ -977,21 +1267,19 @@ def makebinprocs():
                 
             if ourarg.typenum != rt.Types.id['Integer'] or\
                not ourarg.typenum in rt.Types.id.values():
-              rt.Stack.data = oldstack
-              return rt.ded("Type numbers have to be a number which represents a type")
+              return usded("Type numbers have to be a number which represents a type")
             else:          
               argline.append(ourarg.data)
           newargck.append(argline)
         else:
-          rt.Stack.data = oldstack
-          return rt.ded("Next time try including the number of arguments you asked for")
+          return usded("Next time try including the number of arguments you asked for")
       else:
-        rt.Stack.data = oldstack
-        return rt.ded("If you want a built-in, you should consider a less broken dispatch table")
+        return usded("If you want a built-in, you should consider a less broken dispatch table")
     # Assuming we got this far, we made it, so put our new dispatches to the
     # front of the line, and return our object:
     bin.argck = newargck + bin.argck
     bin.dispatches = newdispatches + bin.dispatches
+    bin.compile()
     rt.Stack.push(bin)
     return rt.Context.eval
   bins += [['binhook', x]]
@@ -1078,7 +1366,7 @@ def makebinprocs():
       rt.Stack.push(x)
       return rt.Context.eval
   bins += [['parse', x]]
-  
+
   # To function.
   def x(rt):
     ourstring = rt.Stack.pop()
@@ -1095,6 +1383,41 @@ def makebinprocs():
     rt.Stack.push(rtypes.typestr(rt.Stack.pop().data))
     return rt.Context.eval
   bins += [['str>str', x]]
+
+  # String to bytes, as UTF-8.
+  def x(rt):
+    rt.Stack.push(rtypes.typebytes(rt.Stack.pop().data.encode()))
+    return rt.Context.eval
+  bins += [['str>bytes', x]]
+
+  # List of byte values to bytes.
+  def x(rt):
+    lst = rt.Stack.pop()
+    try:
+      for i in lst.data:
+        if i.typenum != rt.Types.id['Integer']:
+          raise TypeError
+      rt.Stack.push(rtypes.typebytes(bytes([i.data for i in lst.data])))
+    except:
+      rt.Stack.push(lst)
+      return rt.ded('Bytes are whole numbers from 0 to 255, and nothing else')
+    return rt.Context.eval
+  bins += [['lst>bytes', x]]
+
+  # Bytes to string, as UTF-8, or as near as they come.
+  def x(rt):
+    rt.Stack.push(rtypes.typestr(str(rt.Stack.pop().data, 'utf-8', 'replace')))
+    return rt.Context.eval
+  bins += [['bytes>str', x]]
+
+  # Break up bytes into their values, and count them.
+  def x(rt):
+    obj = rt.Stack.pop().data
+    for i in obj:
+      rt.Stack.push(rtypes.typeint(i))
+    rt.Stack.push(rtypes.typeint(len(obj)))
+    return rt.Context.eval
+  bins += [['bytes>', x]]
   
   # Number to string.
   def x(rt):
@@ -1108,16 +1431,73 @@ def makebinprocs():
     return rt.Context.eval
   bins += [['sym>str', x]]
   
+  ### Strings
+
+  # Split a string into a list around a delimiter, or around runs of
+  # whitespace if the delimiter is empty.
+  def x(rt):
+    delim = rt.Stack.pop().data
+    string = rt.Stack.pop().data
+    pieces = string.split(delim) if delim else string.split()
+    rt.Stack.push(rtypes.typelst([rtypes.typestr(i) for i in pieces]))
+    return rt.Context.eval
+  bins += [['split', x]]
+
+  # Join a list of strings into one, with a delimiter between each.
+  def x(rt):
+    delim = rt.Stack.pop()
+    lst = rt.Stack.pop()
+    for i in lst.data:
+      if i.typenum != rt.Types.id['String']:
+        rt.Stack.push(lst)
+        rt.Stack.push(delim)
+        return rt.ded('Only strings can be joined, and in holy matrimony')
+    rt.Stack.push(rtypes.typestr(delim.data.join([i.data for i in lst.data])))
+    return rt.Context.eval
+  bins += [['join', x]]
+
+  # Where one string first turns up in another, or -1 if it doesn't.
+  def x(rt):
+    sub = rt.Stack.pop().data
+    rt.Stack.push(rtypes.typeint(rt.Stack.pop().data.find(sub)))
+    return rt.Context.eval
+  bins += [['find', x]]
+
+  # Replace every appearance of one string in another with a third.
+  def x(rt):
+    new = rt.Stack.pop().data
+    old = rt.Stack.pop().data
+    rt.Stack.push(rtypes.typestr(rt.Stack.pop().data.replace(old, new)))
+    return rt.Context.eval
+  bins += [['replace', x]]
+
+  # Whitespace off both ends.
+  def x(rt):
+    rt.Stack.push(rtypes.typestr(rt.Stack.pop().data.strip()))
+    return rt.Context.eval
+  bins += [['strip', x]]
+
+  def x(rt):
+    rt.Stack.push(rtypes.typestr(rt.Stack.pop().data.upper()))
+    return rt.Context.eval
+  bins += [['upper', x]]
+
+  def x(rt):
+    rt.Stack.push(rtypes.typestr(rt.Stack.pop().data.lower()))
+    return rt.Context.eval
+  bins += [['lower', x]]
+
+
   ### Comparisons
 
   # Equality
   def x(rt):
-    rt.Stack.push(rtypes.typeint(rt.Stack.pop().data==rt.Stack.pop().data))
+    rt.Stack.push(rtypes.typeint(rtypes.equal(rt.Stack.pop(), rt.Stack.pop())))
     return rt.Context.eval
   bins += [['==', x]]
 
   def x(rt):
-    rt.Stack.push(rtypes.typeint(rt.Stack.pop().data!=rt.Stack.pop().data))
+    rt.Stack.push(rtypes.typeint(not rtypes.equal(rt.Stack.pop(), rt.Stack.pop())))
     return rt.Context.eval
   bins += [['!=', x]]
   
@@ -1334,6 +1714,13 @@ def makebinprocs():
     if i >= 0 and i < len(lst.data):
       if lst.typenum == rt.Types.id['String']:
         rt.Stack.push(rtypes.typestr(lst.data[i]))
+      elif lst.typenum == rt.Types.id['Bytes']:
+        rt.Stack.push(rtypes.typeint(lst.data[i]))
+      elif lst.typenum == rt.Types.id['Array']:
+        if rtypes.integral(lst.data):
+          rt.Stack.push(rtypes.typeint(lst.data[i]))
+        else:
+          rt.Stack.push(rtypes.typefloat(lst.data[i]))
       else:
         rt.Stack.push(lst.data[i])
     else:
@@ -1343,13 +1730,17 @@ def makebinprocs():
     return rt.Context.eval
   bins += [['get', x]]
 
-  # Put to list
+  # Put to list.  Lists are values, so we write into a copy, unless nobody
+  # but us can see this one (see unshared).
   def x(rt):
     i = rt.Stack.pop().data
     obj = rt.Stack.pop()
     lst = rt.Stack.pop()
     if i >= 0 and i < len(lst.data):
-      lst = lst.cp()
+      if unshared(lst):
+        lst.threaded = None
+      else:
+        lst = lst.cp()
       lst.data[i]=obj
       rt.Stack.push(lst)
     else:
@@ -1359,7 +1750,61 @@ def makebinprocs():
       return rt.ded('This '+lst.typename+' deserves a better subscript')
     return rt.Context.eval
   bins += [['put', x]]
+
+  # Put into the list (or map) stored under a name, as in PUT 'name STO, or
+  # PUT QUOTE 'name STO if it was stored quoted.  The list is written in place
+  # if the name (and its quote) hold the only reference to it.  Otherwise, a
+  # copy is stored first, which will usually be ours alone for every write
+  # after.
+  def x(rt):
+    i = rt.Stack.pop()
+    obj = rt.Stack.pop()
+    name = rt.Stack.pop()
+    def usded(reason):
+      rt.Stack.push(name)
+      rt.Stack.push(obj)
+      rt.Stack.push(i)
+      return rt.ded(reason)
+
+    tag = rt.deref(name.data)
+    if tag is None:
+      return usded('It is difficult to put into what does not exist')
+    held = tag.obj
+    quoted = held.typenum == rt.Types.id['Quote']
+    lst = held.data if quoted else held
+    mapped = lst.typenum == rt.Types.id['Map']
+    if not mapped and not isinstance(lst, rtypes.typelst):
+      return usded('This name is holding something other than a list')
+    if not mapped and (i.typenum != rt.Types.id['Integer'] or
+                       i.data < 0 or i.data >= len(lst.data)):
+      return usded('This '+lst.typename+' deserves a better subscript')
+
+    # Held by the tag and held, and lst by the quote and lst; or all three
+    # by the tag, held and lst.
+    if quoted:
+      shared = not unshared(held, 2) or not unshared(lst, 2)
+    else:
+      shared = not unshared(lst, 3)
+    if shared:
+      lst = lst.cp()
+      tag.obj = rtypes.typequote(lst) if quoted else lst
+    elif not mapped:
+      lst.threaded = None
+    if mapped:
+      lst.data[i.key()] = (i, obj)
+    else:
+      lst.data[i.data] = obj
+    return rt.Context.eval
+  bins += [['put!', x]]
   
+  # Does a list have something == to this in it?
+  def x(rt):
+    term = rt.Stack.pop()
+    lst = rt.Stack.pop()
+    rt.Stack.push(rtypes.typeint(any(rtypes.equal(i, term) for i in lst.data)))
+    return rt.Context.eval
+  bins += [['has', x]]
+
   # Make a list or convert code to list.
   def x(rt):
     items = rt.Stack.pop().data
@@ -1367,17 +1812,402 @@ def makebinprocs():
       rt.Stack.push(rtypes.typeint(items))
       return rt.ded('If you want '+str(items)+' things in a list, maybe you should have '+str(items)+' things on the stack')
     else:
-      lst = rt.Stack.data[len(rt.Stack.data)-items:]
-      rt.Stack.data = rt.Stack.data[:len(rt.Stack)-items]+[rtypes.typelst(lst)]
+      rt.Stack.push(rtypes.typelst(rt.Stack.take(items)))
     return rt.Context.eval
   bins += [['>lst', x]]
   
   def x(rt):
-    rt.Stack.push(rtypes.typelst(rt.Stack.pop().data))
+    rt.Stack.push(rtypes.typelst(rt.Stack.pop().data[:]))
     return rt.Context.eval
   bins += [['composite>lst', x]]
   
   
+  # MAP, FILTER and REDUCE each run as a code object of their own, as
+  # stream> does, whose one step hands the next item to the evaluator and
+  # backs up to come around again once the evaluator's done.  Results are
+  # collected in a Python list as they come.  The step notes how deep the
+  # stack was before handing each item over, so that an evaluator leaving
+  # anything but the one result can't go unnoticed by helping itself to
+  # what's underneath, or by leaving extras behind.
+  def stepper(rt, step):
+    return rtypes.typecode([rtypes.typebinproc(step), rt.Return]).eval
+
+  # The items of a list, or of code less the Return at its end.
+  def members(rt, obj):
+    if obj.typenum == rt.Types.id['Code']:
+      return obj.data[:-1]
+    return obj.data
+
+  # Evaluate something with each item on the stack, and make a list of
+  # whatever it leaves each time.
+  def x(rt):
+    evaluator = rt.Stack.pop()
+    todo = members(rt, rt.Stack.pop())
+    results = []
+    i = depth = 0
+    caller = rt.Caller
+    def step(rt):
+      nonlocal i, depth
+      if i:
+        if len(rt.Stack) != depth+1:
+          rt.Caller = caller
+          if len(rt.Stack) <= depth:
+            return rt.ded('Something was supposed to come of that')
+          return rt.ded('One thing at a time, if you please')
+        results.append(rt.Stack.pop())
+      if i == len(todo):
+        rt.Stack.push(rtypes.typelst(results))
+        return rt.Context.eval
+      depth = len(rt.Stack)
+      rt.Stack.push(todo[i])
+      i += 1
+      rt.Context.ip -= 1
+      return evaluator.eval
+    return stepper(rt, step)
+  bins += [['map', x]]
+
+  # Make a list of only the items something says yes to.
+  def x(rt):
+    evaluator = rt.Stack.pop()
+    todo = members(rt, rt.Stack.pop())
+    results = []
+    i = depth = 0
+    caller = rt.Caller
+    def step(rt):
+      nonlocal i, depth
+      if i:
+        if len(rt.Stack) != depth+1:
+          rt.Caller = caller
+          return rt.ded('Yes or no would have sufficed')
+        if rt.Stack.pop().data:
+          results.append(todo[i-1])
+      if i == len(todo):
+        rt.Stack.push(rtypes.typelst(results))
+        return rt.Context.eval
+      depth = len(rt.Stack)
+      rt.Stack.push(todo[i])
+      i += 1
+      rt.Context.ip -= 1
+      return evaluator.eval
+    return stepper(rt, step)
+  bins += [['filter', x]]
+
+  # Starting from some value, evaluate something with it and each item in
+  # turn, and keep what it leaves for the next.  It had better leave just
+  # the one thing in place of the two.
+  def x(rt):
+    evaluator = rt.Stack.pop()
+    start = rt.Stack.pop()
+    todo = members(rt, rt.Stack.pop())
+    rt.Stack.push(start)
+    i = 0
+    depth = len(rt.Stack)
+    caller = rt.Caller
+    def step(rt):
+      nonlocal i
+      if len(rt.Stack) != depth:
+        rt.Caller = caller
+        if len(rt.Stack) < depth:
+          return rt.ded('Something was supposed to come of that')
+        return rt.ded('One thing at a time, if you please')
+      if i == len(todo):
+        return rt.Context.eval
+      rt.Stack.push(todo[i])
+      i += 1
+      rt.Context.ip -= 1
+      return evaluator.eval
+    return stepper(rt, step)
+  bins += [['reduce', x]]
+
+  # What to sort some things by: their data, as long as they're all numbers
+  # or all strings, and otherwise None.
+  def sortable(rt, objs):
+    numbers = (rt.Types.id['Integer'], rt.Types.id['Float'])
+    if all(i.typenum in numbers for i in objs) or \
+       all(i.typenum == rt.Types.id['String'] for i in objs):
+      return [i.data for i in objs]
+
+  # Put a list in order, keeping things that tie in the order they were.
+  def x(rt):
+    lst = rt.Stack.pop()
+    keys = sortable(rt, lst.data)
+    if keys is None:
+      rt.Stack.push(lst)
+      return rt.ded('Apples and oranges have no order to speak of')
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    rt.Stack.push(rtypes.typelst([lst.data[i] for i in order]))
+    return rt.Context.eval
+  bins += [['sort', x]]
+
+  # Or in order of whatever something leaves for each item, which is
+  # evaluated once an item, as MAP does, rather than once a comparison, and
+  # had better leave one key each time, as MAP's had better leave one result.
+  def x(rt):
+    evaluator = rt.Stack.pop()
+    lst = rt.Stack.pop()
+    keys = []
+    i = depth = 0
+    caller = rt.Caller
+    def step(rt):
+      nonlocal i, depth
+      if i:
+        if len(rt.Stack) != depth+1:
+          rt.Caller = caller
+          if len(rt.Stack) <= depth:
+            return rt.ded('Something was supposed to come of that')
+          return rt.ded('One thing at a time, if you please')
+        keys.append(rt.Stack.pop())
+      if i == len(lst.data):
+        data = sortable(rt, keys)
+        if data is None:
+          rt.Stack.push(lst)
+          rt.Stack.push(evaluator)
+          rt.Caller = caller
+          return rt.ded('Apples and oranges have no order to speak of')
+        order = sorted(range(len(data)), key=data.__getitem__)
+        rt.Stack.push(rtypes.typelst([lst.data[j] for j in order]))
+        return rt.Context.eval
+      depth = len(rt.Stack)
+      rt.Stack.push(lst.data[i])
+      i += 1
+      rt.Context.ip -= 1
+      return evaluator.eval
+    return stepper(rt, step)
+  bins += [['sortby', x]]
+
+
+  ### Arrays
+
+  # Make an array from a list of numbers: of integers if they all are, and
+  # of floats if not.
+  def x(rt):
+    lst = rt.Stack.pop()
+    integer = True
+    for i in lst.data:
+      if i.typenum == rt.Types.id['Float']:
+        integer = False
+      elif i.typenum != rt.Types.id['Integer']:
+        rt.Stack.push(lst)
+        return rt.ded('Only numbers need apply to an array')
+    try:
+      data = rtypes.newarray([i.data for i in lst.data], integer)
+    except:
+      rt.Stack.push(lst)
+      return rt.ded('Some of these numbers are too big for an array')
+    rt.Stack.push(rtypes.typearray(data))
+    return rt.Context.eval
+  bins += [['>array', x]]
+
+  # An array counting from one number up to (not including) another by a
+  # third, of integers if they all are.
+  def x(rt):
+    step = rt.Stack.pop()
+    stop = rt.Stack.pop()
+    start = rt.Stack.pop()
+    integer = all(rtypes.integral(i.data) for i in (start, stop, step))
+    try:
+      if integer:
+        values = range(start.data, stop.data, step.data)
+      else:
+        count = math.ceil((stop.data-start.data)/step.data)
+        values = [start.data+i*step.data for i in range(max(count, 0))]
+      rt.Stack.push(rtypes.typearray(rtypes.newarray(values, integer)))
+    except:
+      rt.Stack.push(start)
+      rt.Stack.push(stop)
+      rt.Stack.push(step)
+      return rt.ded('This range is going nowhere')
+    return rt.Context.eval
+  bins += [['range', x]]
+
+  # Back to a list of numbers.
+  def x(rt):
+    arr = rt.Stack.pop().data
+    number = rtypes.typeint if rtypes.integral(arr) else rtypes.typefloat
+    rt.Stack.push(rtypes.typelst([number(i) for i in arr.tolist()]))
+    return rt.Context.eval
+  bins += [['array>lst', x]]
+
+  # An array as a string, or as much of one as will fit on a line.
+  def x(rt):
+    arr = rt.Stack.pop().data
+    text = ' '.join(str(i) for i in arr[:ARRAYSHOW].tolist())
+    if len(arr) > ARRAYSHOW:
+      text += ' …'
+    rt.Stack.push(rtypes.typestr('(Array: '+text+')'))
+    return rt.Context.eval
+  bins += [['array>str', x]]
+
+  # Put a number into an array, in place if nobody else can see it, as put
+  # does for lists.  An array of integers only holds integers.
+  def x(rt):
+    i = rt.Stack.pop()
+    obj = rt.Stack.pop()
+    arr = rt.Stack.pop()
+    def usded(reason):
+      rt.Stack.push(arr)
+      rt.Stack.push(obj)
+      rt.Stack.push(i)
+      return rt.ded(reason)
+    if i.data < 0 or i.data >= len(arr.data):
+      return usded('This Array deserves a better subscript')
+    if rtypes.integral(arr.data) and not rtypes.integral(obj.data):
+      return usded('An array of integers has no room for fractions')
+    if not unshared(arr):
+      arr = arr.cp()
+    try:
+      arr.data[i.data] = obj.data
+    except:
+      return usded('This number is too big for an array')
+    rt.Stack.push(arr)
+    return rt.Context.eval
+  bins += [['putarray', x]]
+
+  # Arithmetic on an array and an array or a number, element by element.
+  for op in rtypes.ARITH:
+    def x(rt, op=op):
+      x = rt.Stack.pop()
+      y = rt.Stack.pop()
+      try:
+        rt.Stack.push(rtypes.typearray(rtypes.arith(op, y.data, x.data)))
+      except Exception as error:
+        rt.Stack.push(y)
+        rt.Stack.push(x)
+        if isinstance(error, ZeroDivisionError):
+          return rt.ded('Excuse you')
+        elif isinstance(error, IndexError):
+          return rt.ded('These arrays do not line up')
+        return rt.ded('This produces an intolerably high number')
+      return rt.Context.eval
+    bins += [[op+'array', x]]
+
+
+  ### Maps and sets
+  # See rtypes.typemap for what a key is.  Like arrays, maps and sets are
+  # written in place by whoever takes them off the stack if nobody else can
+  # see them, and copied if somebody can.
+
+  # Make a map from a list of keys, each followed by its value.  Later
+  # values for the same key win.
+  def x(rt):
+    lst = rt.Stack.pop()
+    if len(lst.data) % 2:
+      rt.Stack.push(lst)
+      return rt.ded('Every key wants a value, and this one went without')
+    data = {}
+    for i in range(0, len(lst.data), 2):
+      key = lst.data[i].key()
+      if key is None:
+        rt.Stack.push(lst)
+        return rt.ded('A '+lst.data[i].typename+' is no sort of key')
+      data[key] = (lst.data[i], lst.data[i+1])
+    rt.Stack.push(rtypes.typemap(data))
+    return rt.Context.eval
+  bins += [['>map', x]]
+
+  # Make a set from a list, keeping the first of any duplicates.
+  def x(rt):
+    lst = rt.Stack.pop()
+    data = {}
+    for i in lst.data:
+      key = i.key()
+      if key is None:
+        rt.Stack.push(lst)
+        return rt.ded('A '+i.typename+' is no sort of key')
+      data.setdefault(key, i)
+    rt.Stack.push(rtypes.typeset(data))
+    return rt.Context.eval
+  bins += [['>set', x]]
+
+  # Back to a list: of keys and values by turns, or of a set's members.
+  def x(rt):
+    obj = rt.Stack.pop()
+    if obj.typenum == rt.Types.id['Set']:
+      rt.Stack.push(rtypes.typelst(list(obj.data.values())))
+    else:
+      rt.Stack.push(rtypes.typelst([j for i in obj.data.values() for j in i]))
+    return rt.Context.eval
+  bins += [['map>lst', x]]
+
+  # The keys of a map, or the members of a set, in the order they went in.
+  def x(rt):
+    obj = rt.Stack.pop()
+    if obj.typenum == rt.Types.id['Set']:
+      rt.Stack.push(rtypes.typelst(list(obj.data.values())))
+    else:
+      rt.Stack.push(rtypes.typelst([i[0] for i in obj.data.values()]))
+    return rt.Context.eval
+  bins += [['keys', x]]
+
+  def x(rt):
+    obj = rt.Stack.pop()
+    noun = ' key' if obj.typenum == rt.Types.id['Map'] else ' member'
+    rt.Stack.push(rtypes.typestr('('+obj.typename+': '+str(len(obj.data))+noun+
+                                 's'*(len(obj.data) != 1)+')'))
+    return rt.Context.eval
+  bins += [['map>str', x]]
+
+  # Get the value filed under a key.
+  def x(rt):
+    key = rt.Stack.pop()
+    obj = rt.Stack.pop()
+    try:
+      rt.Stack.push(obj.data[key.key()][1])
+    except KeyError:
+      rt.Stack.push(obj)
+      rt.Stack.push(key)
+      return rt.ded('Nothing is filed under that')
+    return rt.Context.eval
+  bins += [['getmap', x]]
+
+  # File a value under a key.
+  def x(rt):
+    key = rt.Stack.pop()
+    value = rt.Stack.pop()
+    obj = rt.Stack.pop()
+    if not unshared(obj):
+      obj = obj.cp()
+    obj.data[key.key()] = (key, value)
+    rt.Stack.push(obj)
+    return rt.Context.eval
+  bins += [['putmap', x]]
+
+  # Add a member to a set.
+  def x(rt):
+    member = rt.Stack.pop()
+    obj = rt.Stack.pop()
+    key = member.key()
+    if key not in obj.data:
+      if not unshared(obj):
+        obj = obj.cp()
+      obj.data[key] = member
+    rt.Stack.push(obj)
+    return rt.Context.eval
+  bins += [['+set', x]]
+
+  # Is there anything filed under a key?
+  def x(rt):
+    key = rt.Stack.pop()
+    rt.Stack.push(rtypes.typeint(key.key() in rt.Stack.pop().data))
+    return rt.Context.eval
+  bins += [['hasmap', x]]
+
+  # Take a key, and whatever's filed under it, out of a map or set.
+  def x(rt):
+    key = rt.Stack.pop()
+    obj = rt.Stack.pop()
+    if key.key() not in obj.data:
+      rt.Stack.push(obj)
+      rt.Stack.push(key)
+      return rt.ded("You have failed to erase what isn't here!")
+    if not unshared(obj):
+      obj = obj.cp()
+    del obj.data[key.key()]
+    rt.Stack.push(obj)
+    return rt.Context.eval
+  bins += [['rmkey', x]]
+
+
   ### Error handling
   # Cause error
   def x(rt):
@@ -1423,6 +2253,11 @@ def makebinprocs():
     return rt.Context.eval
   bins += [['bxor', x]]
 
+  # Name our functions after themselves, which tracebacks appreciate, and
+  # remember them as internals.
+  for i in bins:
+    i[1].__name__ = i[0]
+    MADE[i[1]] = i[0]
   return bins
 
 # Store all the procedures we know how to make into an extant directory,
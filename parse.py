@@ -7,15 +7,39 @@
 # functions for each type class, and coordinated by parse() and various
 # helpers.
 
+from trivia import *
+
+import re
+
+# Scanners.  These scan with regular expressions rather than a character at
+# a time, since Python is much quicker at that.  Each is compiled the first
+# time somebody asks for it, for a given set of characters.
+scanners = {}
+
+# What each sort of scanner matches, given a set of characters:
+# 'white', a run of them,
+# 'string', a run of anything else, where a backslash lets the next character
+#   through whatever it is, as does one last backslash with nothing after it,
+# 'any', a single one of them.
+scannerforms = {'white': r'[%(c)s]*',
+                'string': r'[^%(c)s\\]*(?:\\.[^%(c)s\\]*)*\\?',
+                'any': r'[%(c)s]'}
+
+def scanner(chars, form):
+  key = (chars, form)
+  if not key in scanners:
+    scanners[key] = re.compile(scannerforms[form] % {'c': re.escape(chars)},
+                               re.DOTALL)
+  return scanners[key]
+
 # Parse token.  This is handed back and forth between the parser and different
 # registered object types to turn text into code.  It also contains the
 # common methods whiteskip, nextobj, and the callback method validnext.
 
-from trivia import *
-
 class parsetoken:
   whitespace = ' \t\r\n'
   delimiters = ['}', '{', ':', ';', '[', ']']
+  white = scanner(whitespace, 'white')
   
   def __init__(self, runtime, text=''):
     self.text = text		# The string to parse
@@ -26,14 +50,13 @@ class parsetoken:
     self.stop = False   	# Flag: stop parsing, either error or done
     self.alternate = False	# Flag: alternate mode (preprocess)
     self.data = None    	# Current object
+    self.recalled = []		# Alternate mode symbols, and what they got
     self.error = ''		# Error message text on invalid stop
     self.whiteskip()		# Advance past any starting whitespace.
 
   # Skip all the whitespace under the cursor.
   def whiteskip(self):
-    while self.cursor < len(self.text) and \
-          self.text[self.cursor] in self.whitespace:
-      self.cursor += 1
+    self.cursor = self.white.match(self.text, self.cursor).end()
     # And if we reached the end, stop.
     if self.cursor >= len(self.text):
       self.stop = True
@@ -50,9 +73,10 @@ class parsetoken:
     if not self.stop:
       # Reset valid flag.
       self.valid = False
-      # Bounce through all the types, and if we get one, or one throws an
-      # error, stop there.
-      for i in self.types.parsetypes:
+      # Bounce through the types which might want text starting like this,
+      # and if we get one, or one throws an error, stop there.
+      for i in self.types.parsers.get(self.text[self.cursor],
+                                      self.types.anyparsers):
         i.parse(self)
         if self.valid or self.stop:
           return
@@ -78,25 +102,22 @@ class parsetoken:
       
 # Parse helpers.
 
+escape = re.compile(r'\\(.?)', re.DOTALL)
+numerals = re.compile(r'[0-9]*')
+
 # Look only for numerals and return the final cursor position and whatever
 # we got.
 def getnumber(text, cursor):
-  number = ''
-  while cursor < len(text) and text[cursor] in '0123456789':
-    number += text[cursor]
-    cursor += 1
-  return number, cursor
+  number = numerals.match(text, cursor).group()
+  return number, cursor+len(number)
 
 # Retrieve a text string up to a closing character or EOF, and do some
 # rudimentary escape character things.
 def getstring(text, cursor, delimiter):
-  newstring = ''
-  while cursor < len(text) and not text[cursor] in delimiter:
-    if text[cursor] == '\\':
-      cursor += 1
-    if cursor < len(text):
-      newstring += text[cursor]
-      cursor += 1
+  newstring = scanner(delimiter, 'string').match(text, cursor).group()
+  cursor += len(newstring)
+  if '\\' in newstring:
+    newstring = escape.sub(r'\1', newstring)
   return newstring, cursor
 
 # Build a list within a composite type.
@@ -126,41 +147,109 @@ def parsecomposite(token, obj, delta, delimiter):
 
 
 # Check to see if text contains any symbolic naughties.
+naughties = scanner(''.join(parsetoken.delimiters)+parsetoken.whitespace, 'any')
+
 def validatename(text):
-  for i in range(len(text)):
-    if text[i] in parsetoken.delimiters or\
-       text[i] in parsetoken.whitespace:
-      return False
-  return True
+  return not naughties.search(text)
 
 # Squeeze one object out of text.
 def parse(runtime, text):
-  token = parsetoken(runtime, text)
+  return finish(parsetoken(runtime, text))
+
+# Or out of a token made earlier, for those who'd like to look it over after.
+def finish(token):
   token.nextobj()
   
   # Did we receive something valid?
   if token.valid:
     # Yes.  Print a warning if there was any trailing garbage.
     if not token.stop:
-      print('Ignoring spurious text:',token.text[token.cursor:])
+      token.runtime.write('Ignoring spurious text: '+
+                          token.text[token.cursor:]+'\n')
     return token.data
   else:
-    # If invalid, try to show the user roughly where things went sideways.
-    print('\nYour words fail to become actions.\n')
-    # Get our overall line number.
-    linenum = token.text[:token.cursor].count('\n')+1
-    # Look back from the cursor to find our last newline.
-    newlinecursor = 0
-    spotonline = 0
-    for i in range(token.cursor-1, -1, -1):
-      if token.text[i] == '\n':
-        newlinecursor = i+1
-        break
+    complain(token)
+
+# If a token came to grief, try to show the user roughly where things went
+# sideways.  Line is the line number the token's text starts on.
+def complain(token, line=1):
+  say = token.runtime.write
+  say('\nYour words fail to become actions.\n\n')
+  # Get our overall line number.
+  linenum = token.text[:token.cursor].count('\n')+line
+  # Look back from the cursor to find our last newline.
+  newlinecursor = 0
+  spotonline = 0
+  for i in range(token.cursor-1, -1, -1):
+    if token.text[i] == '\n':
+      newlinecursor = i+1
+      break
+    else:
+      spotonline += 1
+  # Then just fetch this exact line and show cursor position.
+  say('Stopped on line '+str(linenum)+', position '+str(spotonline+1)+':\n')
+  say(token.text[newlinecursor:].split('\n')[0]+'\n')
+  say(' '*spotonline+'↳✞\n')
+  say('In particular: '+str(token.error)+'\n')
+
+
+# Parse stream.  Hands out the objects in a file one at a time, reading only
+# as much of the file as it takes to be sure of the next one, and forgetting
+# the text of each as it goes.  An object is only certain once there's more
+# than whitespace after it (a symbol or number might yet go on) or the file
+# has run out; until then, or while the parser is unhappy, we read some more
+# and try again.  Each time we have to, we read as much again as we're
+# holding, so one very large object still only takes so many tries.
+class parsestream:
+  def __init__(self, runtime, file, chunk=STREAMCHUNK):
+    self.runtime = runtime
+    self.file = file
+    self.chunk = chunk
+    self.text = ''		# What we've read but not yet parsed
+    self.line = 1		# The line that text starts on
+    self.eof = False		# Flag: nothing more to read
+    self.failed = False		# Flag: the parser complained, and we're done
+
+  # Read some more of the file.
+  def more(self):
+    data = self.file.read(max(self.chunk, len(self.text)))
+    if not len(data):
+      self.eof = True
+    self.text += data
+
+  # Forget text we're done with, keeping count of the lines in it.
+  def consume(self, cursor):
+    self.line += self.text.count('\n', 0, cursor)
+    self.text = self.text[cursor:]
+
+  # All done, one way or another.
+  def close(self):
+    self.file.close()
+    self.text = ''
+    self.eof = True
+
+  # Return the next object, or None if there isn't one.  If that's because
+  # the parser complained, it has already said why and failed is set.
+  def next(self):
+    while not self.failed:
+      token = parsetoken(self.runtime, self.text)
+      if token.stop:
+        # Only whitespace so far.
+        self.consume(token.cursor)
+        if self.eof:
+          self.close()
+          return
       else:
-        spotonline += 1
-    # Then just fetch this exact line and show cursor position.
-    print('Stopped on line '+str(linenum)+', position '+str(spotonline+1)+':')
-    print(token.text[newlinecursor:].split('\n')[0])
-    print(' '*spotonline+'↳✞')
-    print('In particular:', token.error)    
-    # And return nothing.
+        token.nextobj()
+        if (token.valid and not token.stop) or self.eof:
+          if not token.valid:
+            complain(token, self.line)
+            self.failed = True
+            self.close()
+            return
+          self.consume(token.cursor)
+          # A valid None is an alternate mode comment, which is nothing.
+          if token.data is not None:
+            return token.data
+          continue
+      self.more()
@@ -10,44 +10,64 @@
 # It's still mine. -kia
 
 from trivia import *
-import parse, runtime, rtypes, internals
+import parse, runtime, rtypes, internals, image
     
 import signal, sys
 
 # Our simple little Ctrl-C handler.  In some cases we want to raise the
 # error regardless, but usually we just want our runtime to catch it
-# between evals and trace back.
+# between evals and trace back.  Stopping the runtime's inner loop is how
+# it finds out; see rplruntime.rs.  A second Ctrl-C before the first has
+# been delivered changes nothing.
 
 def catchsigint(signal, frame):
   if ourRT.dieanyway:
     raise KeyboardInterrupt
-  else:
+  elif not ourRT.Break:
     ourRT.Break = True
+    ourRT.Running = False
 
-# Create a new runtime containing just our base types (extra types
-# can be added whenever, but the runtime will roll with just these.)
-ourtypes = rtypes.baseregistry()
-ourRT = runtime.rplruntime(ourtypes)
-
-# Store our internals where the language can get them.
-ourRT.sto([INTERNALSDIR], ourRT.firstdir(ourRT.lastobj))
-internals.stoprocs(ourRT, INTERNALSDIR)
+# Our commandline argument as a string, if there is one.
+if len(sys.argv)==2:
+  args = rtypes.typestr(sys.argv[1])
+else:
+  args = rtypes.typestr("")
 
-# And store our version string and base directory.
-ourRT.sto(['VERSION'], rtypes.typestr(VERSION))
-ourRT.sto(['BASDIR'], rtypes.typestr(BASDIR))
+# If there's an up to date boot image, pick up where it left off in boot.rpl,
+# with our own arguments in place of the ones it was made with.
+ourRT = image.load(image.IMAGEPATH) if BOOTIMAGE else None
+if ourRT is not None:
+  ourRT.sto(['ARGS'], args)
+  bootstrap = ourRT.Context.eval
 
-# Drop our commandline argument on the stack as a string, if there is one.
-if len(sys.argv)==2:
-  ourRT.Stack.push(rtypes.typestr(sys.argv[1]))
 else:
-  ourRT.Stack.push(rtypes.typestr(""))
+  # Create a new runtime containing just our base types (extra types
+  # can be added whenever, but the runtime will roll with just these.)
+  ourtypes = rtypes.baseregistry()
+  ourRT = runtime.rplruntime(ourtypes)
+
+  # Store our internals where the language can get them.
+  ourRT.sto([INTERNALSDIR], ourRT.firstdir(ourRT.lastobj))
+  internals.stoprocs(ourRT, INTERNALSDIR)
+
+  # And store our version string and base directory.
+  ourRT.sto(['VERSION'], rtypes.typestr(VERSION))
+  ourRT.sto(['BASDIR'], rtypes.typestr(BASDIR))
+
+  # Drop our commandline argument on the stack.
+  ourRT.Stack.push(args)
+
+  # Load and parse the RPL-side bootstrap.
+  bootstrap = parse.parse(ourRT, LAUNCHCODE).eval
 
-# Load and parse the RPL-side bootstrap.
-bootstrap = parse.parse(ourRT, LAUNCHCODE).eval
+# Write console output a line at a time if anybody's watching.
+ourRT.Linewise = TTYLINES and sys.stdout.isatty()
 
 # Turn on Ctrl-C signal handling.
 signal.signal(signal.SIGINT, catchsigint)
 
-# And start running.
-ourRT.rs(bootstrap)
+# And start running, leaving nothing unsaid at the end.
+try:
+  ourRT.rs(bootstrap)
+finally:
+  ourRT.flush()
@@ -17,7 +17,13 @@
 from trivia import *
 import parse
 
-import copy
+import copy, mmap, array, operator, itertools
+
+# Arrays are packed by NumPy if it's about, or by the array module if not.
+try:
+  import numpy
+except ImportError:
+  numpy = None
 
 # Type registry.  This contains a dictionary matching human readable
 # names with type numbers, a matching list to do the reverse, and a
@@ -33,6 +39,11 @@ class rpltypes:
     self.n = ['Any']
     # Our list of classes for the parser.
     self.parsetypes = []
+    # The same, cut down to those which might claim text starting with a
+    # given character, and to those which might claim anything at all, for
+    # characters nobody in particular claims.
+    self.parsers = {}
+    self.anyparsers = []
     # Finally, reference to the object class itself.
     self.usrproto = {}
 
@@ -45,6 +56,20 @@ class rpltypes:
     self.id[obj.typename] = newnumber
     self.n += [obj.typename]
     obj.typenum = newnumber
+    self.tabulate()
+
+  # Sort out who the parser needs to ask about what, keeping to the order of
+  # parsetypes.  Types that never got a parser of their own can't claim
+  # anything, so there's no asking them.
+  def tabulate(self):
+    parsetypes = [i for i in self.parsetypes
+                  if i.parse is not objarchetype.parse]
+    self.anyparsers = [i for i in parsetypes if i.starts is None]
+    self.parsers = {}
+    for i in parsetypes:
+      for j in i.starts or '':
+        self.parsers[j] = [k for k in parsetypes
+                           if k.starts is None or j in k.starts]
 
   # Register a new user-created type.
   def registerusr(self, obj):
@@ -78,7 +103,14 @@ class rpltypes:
 
 # Archetypal object.  An RPL typed object always contains a type number
 # and the actual data.  It will also, at minimum, have these methods.
+
+# There are a great many of these about at any one time, so each class
+# lists the attributes its instances get in __slots__ rather than carrying
+# a dictionary around.  Anything shared, like the type name and number, is
+# a class attribute.
 class objarchetype:
+  __slots__ = ('data',)
+
   # The human-readable name of our type.
   typename = 'Archetype'
   
@@ -94,6 +126,11 @@ class objarchetype:
   def parse(token):
     pass
 
+  # Every character the parser might claim text starting with, or None if
+  # it might claim text starting with anything.  A type that doesn't say
+  # gets asked about everything.
+  starts = None
+
   # A constructor to initialize the data payload common to all objects.
   def __init__(self, x=None):
     if x != None:
@@ -102,6 +139,11 @@ class objarchetype:
   # Return a duplicate object.  For immutable types, it returns itself.
   def cp(self):
     return self
+
+  # A hashable stand-in for us, to file us under in a map or set (see
+  # typemap), or None if we can't be filed.
+  def key(self):
+    return None
     
   # A self-evaluation routine, which usually pushes the object to the stack.
   def eval(self, runtime):
@@ -111,11 +153,17 @@ class objarchetype:
 
 # Binary call, the barest wrapper around a Python function.
 class typebinproc(objarchetype):
+  __slots__ = ('eval',)
   typename = 'Internal'
   data = '(internal)'
   def __init__(self, procedure):
     self.eval = procedure
 
+  # Our data is a class attribute, which pickle would try to restore as
+  # though it were a slot.
+  def __reduce__(self):
+    return typebinproc, (self.eval,)
+
 # Call context, the basis for the call stack.
 #   code: the code object for this context
 #   names: the first name for this context
@@ -123,6 +171,7 @@ class typebinproc(objarchetype):
 #   ip: instruction pointer
 #   new: 
 class typecontext(objarchetype):
+  __slots__ = ('code', 'names', 'next', 'depth', 'ip')
   typename = 'Context'
   data = '(context)'
   def __init__(self, code, names, next=None):
@@ -135,21 +184,40 @@ class typecontext(objarchetype):
       self.next = next
       self.depth = next.depth-1
     self.ip = 0
+
+  # Likewise, and we might be our own next context, so we can't be rebuilt
+  # from our arguments.
+  def __getstate__(self):
+    return self.code, self.names, self.next, self.depth, self.ip
+  def __setstate__(self, state):
+    self.code, self.names, self.next, self.depth, self.ip = state
     
-  def eval(self, runtime):
-    # Check for ^C before actually doing the next thing.
-    if runtime.Break:
-      runtime.Break = False
-      runtime.Interrupt = True
-      return runtime.ded('Break')
+  # Step through threaded code: a tuple of everybody's eval methods, made
+  # the first time a code object runs.
+  def evalthreaded(self, runtime):
+    ip = self.ip
+    self.ip = ip+1
+    try:
+      return self.code.threaded[ip]
+    except TypeError:
+      return self.code.thread()[ip]
 
+  # Or do it the old fashioned way, looking up each eval as we go.
+  def evalplain(self, runtime):
     next = self.code.data[self.ip].eval
     self.ip += 1
     return next
 
+  if THREADCODE:
+    eval = evalthreaded
+  else:
+    eval = evalplain
+
 # Integer type.
 class typeint(objarchetype):
+  __slots__ = ()
   typename = 'Integer'
+  starts = '#'
   
   def parse(token):
     # Common failure routine.
@@ -190,10 +258,15 @@ class typeint(objarchetype):
   def __init__(self, x):
     self.data = int(x)
 
+  def key(self):
+    return self.data
+
 
 # Float type.
 class typefloat(objarchetype):
+  __slots__ = ()
   typename = 'Float'
+  starts = '+-.0123456789'
   
   def parse(token):
     # Common failure routine.
@@ -253,10 +326,15 @@ class typefloat(objarchetype):
   def __init__(self, x):
     self.data = float(x)
 
+  def key(self):
+    return self.data
+
 
 # String type.
 class typestr(objarchetype):
+  __slots__ = ()
   typename = 'String'
+  starts = '"'
 
   def parse(token):    
     # All strings begin and end with a quote.
@@ -272,11 +350,188 @@ class typestr(objarchetype):
   def __init__(self, x):
     self.data = str(x)
 
+  def key(self):
+    return self.data
+
+# A string that's still sitting in a mapped file (see mappedfile), as a
+# memoryview of its bytes.  Nobody can tell it from any other string, but
+# it's only decoded the first time somebody asks for its data, and in the
+# meantime it costs nothing but the view.  Anybody giving it new data
+# simply gets a string, and pickling it does too.
+STRSLOT = objarchetype.__dict__['data']
+
+class typeview(typestr):
+  __slots__ = ('view',)
+
+  def __init__(self, view):
+    self.view = view
+
+  @property
+  def data(self):
+    if self.view is not None:
+      STRSLOT.__set__(self, str(self.view, 'utf-8', 'replace'))
+      self.view = None
+    return STRSLOT.__get__(self)
+
+  @data.setter
+  def data(self, x):
+    self.view = None
+    STRSLOT.__set__(self, x)
+
+  def __reduce__(self):
+    return typestr, (self.data,)
+
+
+# Bytes type.  Its data is a read-only memoryview, so slices of it are
+# views of the same bytes rather than copies, and a record read from a
+# binary file can be picked apart without copying it again.  There's no
+# literal syntax; bytes come from >BYTES or from files.
+class typebytes(objarchetype):
+  __slots__ = ()
+  typename = 'Bytes'
+
+  def __init__(self, x=b''):
+    self.data = memoryview(x).toreadonly()
+
+  # Copies share the same bytes, since nobody can change them.
+  def cp(self):
+    return typebytes(self.data)
+
+  def __reduce__(self):
+    return typebytes, (bytes(self.data),)
+
+
+# Array type.  A row of numbers, all integers or all floats, packed together
+# rather than each in an object of its own, so that arithmetic on the whole
+# row is one step instead of one per number.  There's no literal syntax;
+# arrays come from >ARRAY and RANGE.  Like lists, arrays are values, which
+# PUT copies unless nobody else can see them.
+class typearray(objarchetype):
+  __slots__ = ()
+  typename = 'Array'
+
+  def __init__(self, x=None):
+    self.data = newarray([], False) if x is None else x
+
+  def __len__(self):
+    return len(self.data)
+
+  def cp(self):
+    return typearray(copy.copy(self.data))
+
+# Pack some numbers into an array of integers or floats.
+def newarray(values, integer):
+  if numpy is not None:
+    return numpy.array(values, numpy.int64 if integer else numpy.float64)
+  return array.array('q' if integer else 'd', values)
+
+# Whether an array, or a plain number, is made of integers.
+def integral(x):
+  if isinstance(x, int):
+    return True
+  elif isinstance(x, float):
+    return False
+  elif isinstance(x, array.array):
+    return x.typecode == 'q'
+  return x.dtype.kind == 'i'
+
+# Elementwise arithmetic on arrays, either of which may be a plain number
+# instead.  Integers stay integers, and as with #7 #2 / they're truncated
+# where they have to be.  Raises ZeroDivisionError for /, IndexError if
+# two arrays don't line up, and whatever else for numbers that get out of
+# hand.
+ARITH = {'+': operator.add, '-': operator.sub, '*': operator.mul,
+         '/': operator.truediv, '^': operator.pow}
+
+def arith(op, y, x):
+  integer = integral(y) and integral(x)
+  plain = isinstance(y, (int, float)) or isinstance(x, (int, float))
+  if not plain and len(y) != len(x):
+    raise IndexError
+  f = ARITH[op]
+  if numpy is not None:
+    if op == '/' and numpy.any(numpy.asarray(x) == 0):
+      raise ZeroDivisionError
+    # Floats go to infinity and back to nothing as Python's own do: quietly,
+    # except for powers that outgrow them.
+    with numpy.errstate(all='raise', under='ignore',
+                        over='raise' if op == '^' else 'ignore'):
+      if integer and (op == '/' or
+                      op == '^' and numpy.any(numpy.asarray(x) < 0)):
+        y = numpy.asarray(y, numpy.float64)
+        return numpy.trunc(f(y, x)).astype(numpy.int64)
+      if integer:
+        return checked(f, y, x)
+      return numpy.asarray(f(y, x), numpy.float64)
+  if integer and op in '/^':
+    f = lambda y, x, f=f: int(f(y, x))
+  if plain:
+    if isinstance(x, (int, float)):
+      values = map(f, y, itertools.repeat(x))
+    else:
+      values = map(f, itertools.repeat(y), x)
+  else:
+    values = map(f, y, x)
+  return newarray(values, integer)
+
+
+# NumPy's integers wrap around where the array module's would overflow.  So
+# work the answer out roughly in floats as well, and anywhere that comes
+# near the edge, work it out exactly in Python's integers, which raise
+# OverflowError on the way back into an array if they don't fit.
+def checked(f, y, x):
+  result = numpy.asarray(f(y, x), numpy.int64)
+  with numpy.errstate(all='ignore'):
+    rough = f(numpy.asarray(y, numpy.float64), numpy.asarray(x, numpy.float64))
+  if numpy.all(numpy.abs(rough) < 2.0**62):
+    return result
+  exact = f(numpy.asarray(y, object), numpy.asarray(x, object))
+  return numpy.asarray(exact, object).astype(numpy.int64)
+
+
+# Map type.  A table of values filed under keys, so that finding one takes
+# the same time however many there are.  A key is whatever an object's key
+# method gives: integers, floats and strings are filed under their data, so
+# any two of them which are == are the same key (#1 and 1. included), and
+# symbols under a tuple of their names.  Nothing else has a key.  The data
+# is a dictionary from each key to a pair of the object it came from and
+# its value.  There's no literal syntax; maps come from >MAP.  Like lists,
+# maps are values, which PUT copies unless nobody else can see them.
+class typemap(objarchetype):
+  __slots__ = ()
+  typename = 'Map'
+
+  def __init__(self, x=None):
+    self.data = {} if x is None else x
+
+  def __len__(self):
+    return len(self.data)
+
+  def cp(self):
+    return type(self)(dict(self.data))
+
+# Set type.  A map without values: its dictionary goes from each key to the
+# object it came from.  Sets come from >SET.
+class typeset(typemap):
+  __slots__ = ()
+  typename = 'Set'
+
+# Whether two objects are equal, as == sees it: whether their data is.  Not
+# so for arrays, which have to be compared a number at a time, since NumPy's
+# == answers with an array of its own instead of yes or no.
+def equal(y, x):
+  if isinstance(y, typearray) or isinstance(x, typearray):
+    return type(y) is type(x) and y.data.tolist() == x.data.tolist()
+  return y.data == x.data
+
 
 # Generic quote type.  When evaluated, it returns its contents, useful for
 # preventing the immediate evaluation of code and symbols.
 class typequote(objarchetype):
+  __slots__ = ()
   typename = 'Quote'
+  starts = "'"
+
   def parse(token):
     # Quotes start with an apostrophe.
     if token.text[token.cursor] == "'": 
@@ -304,11 +559,19 @@ class typequote(objarchetype):
     
 
 # Symbol type.  This evaluates whatever it's pointed to as soon as it's
-# encountered.
+# encountered.  Each symbol also remembers the tag it last resolved to, along
+# with the names it started from and the runtime's store generation at the
+# time; if both still match, the tag's contents are still the right answer.
 class typesym(objarchetype):
+  __slots__ = ('cachenames', 'cachegen', 'cachetag')
   typename = 'Symbol'
+  starts = None
+
   def __init__(self, x):
     self.data = x
+    self.cachenames = None
+    self.cachegen = None
+    self.cachetag = None
   
   def parse(token):    
     cursor = token.cursor
@@ -323,6 +586,7 @@ class typesym(objarchetype):
         if thing is None:
           token.invalidate("This symbol has to exist at parse time")
         else:
+          token.recalled.append((ourtext, thing))
           token.validnext(thing, cursor)
       else:
         token.validnext(typesym(ourtext), cursor)
@@ -331,27 +595,42 @@ class typesym(objarchetype):
   
   # Evaluating a symbol attempts to retrieve it by name and evaluate that.
   def eval(self, runtime):
-    x = runtime.rcl(self.data)
-    if x is None:
-      # Couldn't find symbol.
-      runtime.Caller = runtime.rtcaller
-      oursym = symtostr(self.data)        
-      return runtime.ded('We seek '+oursym+' but we cannot always find '+oursym)
-    elif runtime.Break:
-      # Most but not all circular references are caught at store time, so
-      # we catch ^C here too.
-      runtime.Interrupt = True
-      runtime.Break = False
-      return runtime.ded('Break')
+    names = runtime.Context.names
+    if self.cachenames is names and self.cachegen == runtime.Generation:
+      x = self.cachetag.obj
     else:
-      # We did retrieve something, so pass it along to be evaluated.
-      return x.eval
+      tag = runtime.deref(self.data)
+      # Something on the way might not be loaded yet.
+      if tag is None and runtime.unstub(self.data):
+        tag = runtime.deref(self.data)
+      if tag is None:
+        # Couldn't find symbol.
+        runtime.Caller = runtime.rtcaller
+        oursym = symtostr(self.data)        
+        return runtime.ded('We seek '+oursym+' but we cannot always find '+oursym)
+      self.cachenames = names
+      self.cachegen = runtime.Generation
+      self.cachetag = tag
+      x = tag.obj
+    # We did retrieve something, so pass it along to be evaluated.
+    return x.eval
+
+  def key(self):
+    return tuple(self.data)
+
+  # And that memory is left behind when pickled.
+  def __getstate__(self):
+    return self.data
+  def __setstate__(self, data):
+    self.__init__(data)
     
 
 # Comment string.  A special case string that's retained in programs and lists
 # but vanishes when evaluated.
 class typerem(typestr):
+  __slots__ = ()
   typename = 'Comment'
+  starts = '()'
 
   def parse(token):    
     # Comments begin with ( and end with ).
@@ -362,9 +641,13 @@ class typerem(typestr):
       cursor = token.cursor+1
       # Scan text for matching nested parentheses, so blocks of code can be
       # easily commented out without escaping all the close parens.
-      while cursor < len(token.text) and depth:
-        depth += (token.text[cursor] == '(') - (token.text[cursor] == ')')
-        cursor += 1
+      parens = parse.scanner('()', 'any')
+      while depth:
+        found = parens.search(token.text, cursor)
+        if found is None:
+          break
+        depth += 1 if found.group() == '(' else -1
+        cursor = found.end()
       # Remaining depth means we ran out of text to scan.
       if depth:
         token.invalidate("These remarks have gone on far too long")
@@ -382,18 +665,68 @@ class typerem(typestr):
 # A specific purpose, singly linked list used for named storage:
 # 'tag' is a Tag,
 # 'next' is the next Directory.
+# First entries (the null-named ones made by runtime.firstdir) also carry:
+# 'index', a dictionary from names to the first entry of that name in the
+#   run of links up to the next first entry or the lastobj,
+# 'last', the final link in that run.
+# Everyone else leaves index as None and gets paraded through one at a time.
 class typedir(objarchetype):
+  __slots__ = ('tag', 'next', 'index', 'last')
   typename = 'Directory'
-  
+  starts = '[]'
+
   def __init__(self, name, nextobj):
     self.tag = name
     if nextobj is None:
       self.next = self
     else:
       self.next = nextobj
+    self.index = None
+    self.last = None
     # Here so == can hopefully tell us apart by address.
     self.data = self
 
+  # Rebuild the index of a first entry from scratch.  Our run ends at the
+  # next first entry, or at the self-referencing lastobj.  Only the first
+  # of any duplicated names is recorded, so shadowing works as before.
+  def reindex(self):
+    self.index = {}
+    current = self
+    while current.next.index is None and current.next is not current.next.next:
+      current = current.next
+      if current.tag.name not in self.index:
+        self.index[current.tag.name] = current
+    self.last = current
+
+  # Append a tag to the end of our run, and return the new link.
+  def link(self, tag):
+    self.last.next = typedir(tag, self.last.next)
+    self.last = self.last.next
+    if tag.name not in self.index:
+      self.index[tag.name] = self.last
+    return self.last
+
+  # Pop the link after 'previous' out of our run.
+  def unlink(self, previous):
+    gone = previous.next
+    previous.next = gone.next
+    if gone.index is not None:
+      # Somebody removed a whole first entry, so its run is ours now.
+      self.reindex()
+      return
+    if gone is self.last:
+      self.last = previous
+    # If the index pointed at what we just removed, look for a duplicate
+    # further down the run that's now visible, or forget the name.
+    if self.index.get(gone.tag.name) is gone:
+      del self.index[gone.tag.name]
+      current = previous
+      while current is not self.last:
+        current = current.next
+        if current.tag.name == gone.tag.name:
+          self.index[current.tag.name] = current
+          break
+
   def parse(token):
     # Just to be a good sport, catch spurious closed brackets too.
     if token.text[token.cursor] == ']':
@@ -405,7 +738,6 @@ class typedir(objarchetype):
       token.cursor += 5
       token.whiteskip()
       firstdir = token.runtime.firstdir()
-      nextdir = firstdir
       running = True
       
       while running:
@@ -425,8 +757,7 @@ class typedir(objarchetype):
           # We got one, so add it to the chain.
           if token.valid:
             token.valid = False
-            nextdir.next = typedir(token.data, nextdir.next)
-            nextdir = nextdir.next
+            firstdir.link(token.data)
           # Or tag threw an error, in which case pass it along.  
           elif token.stop:
             running = False
@@ -445,6 +776,10 @@ class typedir(objarchetype):
       ourcopy = typedir(self.tag.cp(), self.next)
       rest = ourcopy
       current = self
+      # First entries in the copy get indexed once the whole chain exists.
+      firsts = []
+      if self.index is not None:
+        firsts.append(ourcopy)
       # Lastobjs point to themselves, so we only follow til we get to a self-ref.
       while current.next is not current.next.next:
         # Each new 'rest' initially points back to the original list, retaining
@@ -452,9 +787,13 @@ class typedir(objarchetype):
         current = current.next
         rest.next = typedir(rest.next.tag.cp(), current.next)
         rest = rest.next
+        if current.index is not None:
+          firsts.append(rest)
         # We have to recurse to catch subdirectories, but only to a point.
         if rest.tag.obj.typenum == self.typenum:
           rest.tag.obj = rest.tag.obj.cp(depth-1)
+      for i in firsts:
+        i.reindex()
       return ourcopy
     else:
       # If we're out of recursion depth, silently return the original.
@@ -462,18 +801,113 @@ class typedir(objarchetype):
     
 
 # IO type.  Used as handles for files and character devices, probably.
+# We hang onto the runtime that opened us, so anything we've got to say on
+# the way out is said in its turn with everything else.
 class typeio(objarchetype):
+  __slots__ = ('eof', 'runtime')
   typename = 'Handle'
   
-  # Python's EOF handling is kind of garbage, but I feex.
-  eof = False
-  def __init__(self, data):
+  def __init__(self, data, runtime):
     self.data = data
+    self.runtime = runtime
+    # Python's EOF handling is kind of garbage, but I feex.
+    self.eof = False
   def __del__(self):
     try:
       self.data.close()
     except:
-      print('By the way, a terrible fate has befallen a forgotten file handle')
+      self.runtime.write('By the way, a terrible fate has befallen a '
+                         'forgotten file handle\n')
+      self.runtime.flush()
+
+# A file mapped into memory for reading, which can stand in for a Python
+# file object in a Handle.  Lines, and whatever's left, come out as views
+# into the map rather than as strings of their own; see typeview.  Only
+# reading some number of characters has to decode anything, and that, only
+# the bytes it needs.  Lines end with LF; a CR before it is kept.
+class mappedfile:
+  def __init__(self, filename):
+    with open(filename, 'rb') as file:
+      try:
+        self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+      except ValueError:
+        # Empty files can't be mapped, but there's not much to map anyway.
+        self.map = b''
+    self.view = memoryview(self.map)
+    self.cursor = 0
+
+  # Read a line, without its newline, or None if we're already at the end.
+  def readline(self):
+    if self.cursor >= len(self.map):
+      return None
+    end = self.map.find(b'\n', self.cursor)
+    if end < 0:
+      end = len(self.map)
+    line = typeview(self.view[self.cursor:end])
+    self.cursor = end+1
+    return line
+
+  # Read all the lines that are left.  Finding them one by one is slow, so
+  # they're split out of a copy of the rest of the map, but still aren't
+  # decoded until they're looked at.
+  def readlines(self):
+    lines = self.map[self.cursor:].split(b'\n')
+    self.cursor = len(self.map)
+    if not lines[-1]:
+      lines.pop()
+    return [typeview(i) for i in lines]
+
+  # Read everything that's left.
+  def readall(self):
+    rest = typeview(self.view[self.cursor:])
+    self.cursor = len(self.map)
+    return rest
+
+  # Read up to n characters.  UTF-8 takes at most 4 bytes for each.  Bytes
+  # which aren't UTF-8 count as a character apiece, to keep our place.
+  def read(self, n):
+    text = str(self.view[self.cursor:self.cursor+4*n], 'utf-8',
+               'surrogateescape')[:n]
+    text = text.encode('utf-8', 'surrogateescape')
+    self.cursor += len(text)
+    return typestr(text.decode('utf-8', 'replace'))
+
+  # The map can't be closed while views of it are about, but then it goes
+  # away on its own when they do.
+  def close(self):
+    self.view.release()
+    try:
+      self.map.close()
+    except (BufferError, AttributeError):
+      pass
+
+
+# Autoload stub.  Stands in the named store for one of the names some boot
+# modules export, until it's evaluated.  Then the runtime loads the modules
+# (see rplruntime.autoload), which store the real things over us and all our
+# siblings, and we evaluate whatever took our place.  Recalling, storing
+# over, or checking for us leaves us be.
+# 'data' is a list of paths to load, in order, shared among siblings,
+# 'names' is a list of the names we and our siblings are standing in for,
+# 'loader' is the dsk> internal,
+# 'name' is the name we're standing in for.
+class typestub(objarchetype):
+  __slots__ = ('names', 'loader', 'name')
+  typename = 'Autoload'
+
+  def __init__(self, data, names, loader, name):
+    self.data = data
+    self.names = names
+    self.loader = loader
+    self.name = name
+
+  def eval(self, runtime):
+    runtime.autoload(self)
+    obj = runtime.rcl([self.name])
+    if obj is None or obj.__class__ is typestub:
+      runtime.Caller = runtime.rtcaller
+      return runtime.ded('Loaded up and still no '+self.name)
+    return obj.eval
 
 
 # Tag type.
@@ -485,7 +919,11 @@ class typeio(objarchetype):
 # name may be covered by a local variable.  It's also the basis
 # of the user type scheme.
 class typetag(objarchetype):
+  # User types keep their own type number, and their prototypes their own
+  # name and evaluator, in a dictionary only they end up needing.
+  __slots__ = ('name', 'obj', '__dict__')
   typename = 'Tag'
+  starts = ':'
   
   def __init__(self, data, obj):
     self.name = data
@@ -548,7 +986,9 @@ class typetag(objarchetype):
 
 # List type.
 class typelst(objarchetype):
+  __slots__ = ('threaded',)
   typename = 'List'
+  starts = '{}'
 
   def parse(token):
     # Just to be a good sport, catch spurious closed brackets too.
@@ -566,16 +1006,35 @@ class typelst(objarchetype):
       self.data = x
     else:
       self.data = []
+    self.threaded = None
 
   def __len__(self):
     return len(self.data)
     
-  # Duplicating a list makes a new list, but points to old objects.
+  # Duplicating a list makes a new list, but points to old objects.  The
+  # copy is about to be changed, more than likely, so it doesn't get to keep
+  # our threaded code.
   def cp(self):
     newme = copy.copy(self)
     newme.data = newme.data[:]
+    newme.threaded = None
     return newme
 
+  # Threaded code: a tuple of each object's eval method, which is what a
+  # context actually steps through.  It's made on first execution and kept,
+  # so anything which changes data in place should do so on a fresh cp(),
+  # or else throw it away.
+  def thread(self):
+    self.threaded = tuple([i.eval for i in self.data])
+    return self.threaded
+
+  # Which also means it's left behind when pickled.
+  def __getstate__(self):
+    return self.data
+  def __setstate__(self, data):
+    self.data = data
+    self.threaded = None
+
   # Helpers for stack use.
   def push(self, value):
     self.data.append(value)
@@ -588,7 +1047,9 @@ class typelst(objarchetype):
  
 # Code type.  This is very much a list.
 class typecode(typelst):
+  __slots__ = ()
   typename = 'Code'
+  starts = ':;'
   
   def parse(token):
     # Catch semicolons here; if they got this far, they're spurious.
@@ -608,6 +1069,37 @@ class typecode(typelst):
   def eval(self, runtime):
     return runtime.newcall(self)
 
+# The data stack.  As far as anybody can tell it's a list, with its top at
+# the end of data, but it's never swapped out for a new one: everything that
+# drops, duplicates or shuffles lines does it in place, and only touches the
+# lines involved, however deep the stack is.  It isn't a registered type,
+# since it only ever shows itself to the language as a copy.
+class typestack(typelst):
+  __slots__ = ()
+
+  def cp(self):
+    return typelst(self.data[:])
+
+  # Take n lines off the top, returning them bottom first.
+  def take(self, n):
+    lines = self.data[len(self.data)-n:]
+    del self.data[len(self.data)-n:]
+    return lines
+
+  def dropn(self, n):
+    del self.data[len(self.data)-n:]
+
+  def dupn(self, n):
+    self.data.extend(self.data[len(self.data)-n:])
+
+  # Bring line n to the top, or send the top down to line n.
+  def roll(self, n):
+    self.data.append(self.data.pop(len(self.data)-n))
+
+  def rolld(self, n):
+    top = self.data.pop()
+    self.data.insert(len(self.data)-n+1, top)
+
     
 # RPL built-in command type.  This does basic type and argument count
 # checking.  It then hops along to dispatch where the command-specific work
@@ -617,6 +1109,9 @@ class typecode(typelst):
 # function.
 
 class typebin(objarchetype):
+  # Builtins are few, and all their attributes have class-wide defaults, so
+  # they're the exception and keep a dictionary.
+  __slots__ = ('__dict__',)
   typename = 'Builtin'
   
   data = 'NOP'
@@ -628,6 +1123,14 @@ class typebin(objarchetype):
   dispatches = []
   # Number of expected arguments.
   argct = 0
+
+  # The table, compiled for lookup by compile(): a dictionary from tuples of
+  # argument type numbers to dispatches, and a list of the rows containing
+  # wildcards, in order, with their dispatches.  Anything which changes the
+  # table should compile it again afterward.  Small tables, and any nobody
+  # compiled, are searched in order instead.
+  exact = None
+  wild = None
   
   # Conceptually useful for saving a snapshot of a builtin before hooking it.
   def cp(self):
@@ -637,63 +1140,83 @@ class typebin(objarchetype):
     newbin.dispatches = self.dispatches[:]
     newbin.argct = self.argct
     newbin.hint = self.hint
+    newbin.compile()
     return newbin
-  
-  def evalnotimplemented(self, runtime):
-    # Preemptively claim responsibility for errors.
-    runtime.Caller = self
-    
-    # First check to see that we have enough arguments.
-    if len(runtime.Stack)<self.minargs:
-      return runtime.ded('How about '+str(self.minargs)+' arguments instead of '+\
-          str(len(runtime.Stack))+'?')
-    else:
-      # We do have enough, so what are their types?
-      types = [None]
-      for arg in runtime.Stack.data[len(runtime.Stack.data)-self.minargs:]:
-        types += [arg.typenum]
-      # Search dispatch table top to bottom.
-      for line in self.table:
-        match = True
-        i = self.minargs
-        # Check each argument to match type number.  0 will match any type.
-        while match and i:
-          if line[i] and line[i] != types[i]:
-            match = False
-          i -= 1
-        # Suggest the runtime call the first matching dispatch.
-        if match: 
-          return line[i].eval
-      # It is an error to fall out the bottom of the dispatch table.
-      return runtime.ded('There are '+str(len(self.table))+' ways to call and you tried #'+\
-      str(len(self.table)+1))
 
+  # When pickled, the compiled table is left behind, since it remembers
+  # whatever we've been called with lately.
+  def __getstate__(self):
+    state = dict(self.__dict__)
+    state.pop('exact', None)
+    state.pop('wild', None)
+    return state
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.compile()
+
+  # Rows without wildcards go straight into the dictionary, unless an earlier
+  # row would have caught them first.  Rows with them are searched in order
+  # when the dictionary comes up empty, and whatever that finds is added to
+  # the dictionary, so the first match still wins but only needs finding once.
+  def compile(self):
+    if len(self.argck) <= SCANROWS:
+      self.exact = self.wild = None
+      return
+    self.exact = {}
+    self.wild = []
+    for row, dispatch in zip(self.argck, self.dispatches):
+      key = tuple(row)
+      if 0 in key:
+        self.wild.append((key, dispatch))
+      elif not key in self.exact and self.search(key) is None:
+        self.exact[key] = dispatch
+
+  # Find the first wildcard row matching our argument types.  0 will match
+  # any type.
+  def search(self, got):
+    for row, dispatch in self.wild:
+      for want, have in zip(row, got):
+        if want and want != have:
+          break
+      else:
+        return dispatch
+    return None
   
   def eval(self, runtime):
     # Preemptively claim responsibility for errors.
     runtime.Caller = self
     
     # First check to see that we have enough arguments.
-    if len(runtime.Stack)<self.argct:
+    data = runtime.Stack.data
+    if len(data)<self.argct:
       return runtime.ded('How about '+str(self.argct)+' arguments instead of '+\
-          str(len(runtime.Stack))+'?')
+          str(len(data))+'?')
+    exact = self.exact
+    if exact is None:
+      # Check each row in turn.  0 will match any type.
+      base = len(data)-self.argct
+      for row, dispatch in zip(self.argck, self.dispatches):
+        i = base
+        for want in row:
+          if want and want != data[i].typenum:
+            break
+          i += 1
+        else:
+          # Suggest the runtime call the first matching dispatch.
+          return dispatch.eval
     else:
       # We do have enough args, so what are they?
-      wegot = []
-      for i in range(len(runtime.Stack.data)-self.argct, 
-                     len(runtime.Stack.data)):
-        wegot += [runtime.Stack.data[i].typenum]
-
-      for i in range(len(self.argck)):
-        # Check each argument to match type number.  0 will match any type.
-        match = True
-        for j in range(self.argct):
-          if self.argck[i][j] and self.argck[i][j] != wegot[j]: match = False
+      wegot = tuple([i.typenum for i in data[len(data)-self.argct:]])
+      try:
         # Suggest the runtime call the first matching dispatch.
-        if match: 
-          return self.dispatches[i].eval
-          
-      return runtime.ded('There are '+str(len(self.argck))+' ways to call and you tried #'+\
+        return exact[wegot].eval
+      except KeyError:
+        dispatch = self.search(wegot)
+      if dispatch is not None:
+        exact[wegot] = dispatch
+        return dispatch.eval
+
+    return runtime.ded('There are '+str(len(self.argck))+' ways to call and you tried #'+\
       str(len(self.argck)+1))
   
 
@@ -703,7 +1226,7 @@ def baseregistry():
   Types = rpltypes()
   for i in [typecontext, typebinproc, typesym, typefloat, typestr, typerem,
             typebin, typedir, typetag, typelst, typecode, typeint, typeio,
-            typequote]:
+            typequote, typestub, typebytes, typearray, typemap, typeset]:
     Types.register(i)
   return Types
 
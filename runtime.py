@@ -7,7 +7,8 @@
 # to execute RPL code and manipulate the named store.
 
 from trivia import *
-from rtypes import typedir, typelst, typerem, typeint, typestr, typetag, typecontext, typebinproc, typesym, typecode
+import sys
+from rtypes import typedir, typelst, typerem, typeint, typestr, typetag, typecontext, typebinproc, typesym, typecode, typestack, typequote, typestub
 
 # Drop out of a call unconditionally: 'ret'.
 def ret(x):
@@ -40,11 +41,16 @@ class rplruntime:
     self.Interrupt = False
     
     # Stack stack stack stack.
-    self.Stack = typelst([])
+    self.Stack = typestack([])
     
     # Catch sigints with a bit more aplomb.
     self.Break = False
     self.dieanyway = False
+    # Where rs may deliver a Break: both ways of stepping a context, and
+    # symbol lookup, since not all circular references are caught at store
+    # time.
+    self.breakpoints = (typecontext.evalthreaded, typecontext.evalplain,
+                        typesym.eval)
             
     # Democratize the power to drop a context. 
     self.Return = typebinproc(ret)
@@ -61,6 +67,20 @@ class rplruntime:
     # Running flag is cleared when we're out of contexts.
     self.Running = True    
 
+    # Store generation.  Symbols remember which tag they last found, and
+    # this gets bumped whenever the shape of the named store changes in a
+    # way that might make that memory a lie.
+    self.Generation = 0
+
+    # Every file DSK> has parsed, which a boot image depends upon.
+    self.Sources = set()
+
+    # Console output not yet written, and how much of it there is.  Whoever
+    # starts us up decides whether to write each line as it's finished.
+    self.Output = []
+    self.Outsize = 0
+    self.Linewise = False
+
     # This is the first Context object.
     self.Context = typecontext(self.nullcode, self.firstdir())
     
@@ -68,11 +88,28 @@ class rplruntime:
     types.updatestore(self)
     
 
+  # Console output.  Everything for stdout comes through here, to be written
+  # a sizable chunk at a time rather than a scrap at a time.
+  def write(self, text):
+    self.Output.append(text)
+    self.Outsize += len(text)
+    if self.Outsize >= OUTBUFFER or (self.Linewise and '\n' in text):
+      self.flush()
+
+  def flush(self):
+    if self.Output:
+      sys.stdout.write(''.join(self.Output))
+      self.Output = []
+      self.Outsize = 0
+    sys.stdout.flush()
+
   # Runtime error handler.  This attempts to force a new context and evaluate
   # the exception object within it.
   def ded(self, reason):
-    # Hang onto the reason.
+    # Hang onto the reason, and get anything said so far out of the way of
+    # the traceback.
     self.Reason = reason
+    self.flush()
 
     # Force a new context.  This exempts the error handler from the 
     # recursion limit, and also keeps it from landing on top of code we might
@@ -83,7 +120,7 @@ class rplruntime:
     # because the handler itself threw an error, that could quickly get out of 
     # hand.  If we're already into negative depths, we've been betrayed thus.
     if self.Context.depth < -1:
-      print('...panik!  Excess recursion while already trying to handle an error')
+      self.write('...panik!  Excess recursion while already trying to handle an error\n')
       self.Running = False 
       
     return typesym(DEDEVAL).eval
@@ -91,10 +128,43 @@ class rplruntime:
   # "Run/stop": The innermost loop.  It accepts an object's eval method;
   # each eval method returns the next eval method.  This loop continues
   # until the Running flag is cleared (either under program control, or when
-  # the lowest Context object runs out of things to do.)
+  # the lowest Context object runs out of things to do.)  Ctrl-C clears
+  # the Running flag too, having set Break first, so the loop itself needn't
+  # check for it.  When that happens we carry on to a spot where breaking
+  # has always been noticed -- about to step a context or look up a symbol --
+  # and drop into the error handler from there.  If another Ctrl-C comes
+  # along on the way, we start over; if the program stops of its own accord
+  # first, the Break is left set for whoever carries on after us.
+  #
+  # Python only runs the handler between its own bytecodes, so an internal
+  # which takes its time (sorting a long list, say) finishes first.  After
+  # that, it's whatever is left of evaluating the current object: a context
+  # step is never more than a few evals away.
   def rs(self, next):
-    while self.Running:
-      next = next(self)
+    while True:
+      while self.Running:
+        next = next(self)
+      if not self.Break:
+        return
+      self.Break = False
+      self.resume()
+      while self.Running and \
+            not getattr(next, '__func__', None) in self.breakpoints:
+        next = next(self)
+      if self.Running:
+        self.Interrupt = True
+        next = self.ded('Break')
+      elif not self.Break:
+        self.Break = True
+        return
+
+  # Set the Running flag again, without losing a Ctrl-C in the process: it
+  # only has to have arrived before we look, and if it arrives after, it
+  # clears Running itself.
+  def resume(self):
+    self.Running = True
+    if self.Break:
+      self.Running = False
 
   # Queue a new context.  This will add a line to the call stack unless there
   # is a tail call to optimize.
@@ -129,12 +199,119 @@ class rplruntime:
   # Hierarchical named store routines.
 
   # Prepare a new first directory entry.  Only one lastobj is required, but
-  # first entries are all unique.
+  # first entries are all unique.  Each one keeps an index of the names in
+  # its run of links, up to the next first entry or the lastobj.
   def firstdir(self, obj=None):
     if obj is None:
       obj = self.lastobj
     # Nulltag is a null-named tag containing a null remark.
-    return typedir(self.nulltag, obj)
+    newdir = typedir(self.nulltag, obj)
+    newdir.reindex()
+    return newdir
+
+  # Find the first entry matching a name, starting from any directory link.
+  # First entries answer for their whole run at once from their index, and
+  # we only parade one link at a time through anything unindexed.  Shadowing
+  # works out the same, since local variables are always in front.
+  def seek(self, current, name):
+    while current is not self.lastobj:
+      if current.index is None:
+        if current.tag.name == name:
+          return current
+        current = current.next
+      else:
+        entry = current.index.get(name)
+        if entry is not None:
+          return entry
+        current = current.last.next
+
+  # Walk a dotted name as deref would, and if an autoload stub is in the way,
+  # load what it stands in for.  Only evaluating a symbol goes to the trouble
+  # (see typesym.eval); everything else takes the named store as it finds it.
+  # Returns whether anything got loaded.
+  def unstub(self, namelist):
+    current = self.Context.names
+    for i in namelist:
+      if current.typenum != self.dirtype:
+        return False
+      current = self.seek(current, i)
+      if current is None:
+        return False
+      current = current.tag.obj
+      if current.__class__ is typestub:
+        self.autoload(current)
+        return True
+    return False
+
+  # Load the modules an autoload stub stands in for.  Each name it stands in
+  # for gets a placeholder first, so the modules store over those in the same
+  # spots without setting us off again; anything they didn't get around to
+  # storing is erased afterward.  The modules run to completion then and
+  # there, with a call stack of their own on top of the root directory, a
+  # data stack of their own, and the internals directory within reach, as it
+  # was when booting.  Whatever we were in the middle of gets its stacks back
+  # untouched afterward.
+  def autoload(self, stub):
+    root = self.Context
+    while root.next is not root:
+      root = root.next
+    root = root.names
+    placeholder = typerem('')
+    for i in stub.names:
+      entry = self.seek(root, i)
+      if entry is not None and entry.tag.obj.__class__ is typestub and \
+         entry.tag.obj.data is stub.data:
+        entry.tag.obj = placeholder
+
+    internals = self.seek(root, INTERNALSDIR)
+    quoted = None
+    if internals is not None and internals.tag.obj.__class__ is typequote:
+      quoted = internals.tag.obj
+      internals.tag.obj = quoted.data
+      self.Generation += 1
+
+    context, running, caller = self.Context, self.Running, self.Caller
+    stack = self.Stack.data
+    self.Stack.data = []
+    code = []
+    for i in stub.data:
+      code += [typestr(i), stub.loader]
+    self.Context = typecontext(typecode(code+[self.Return]), root)
+    self.resume()
+    self.rs(self.Context.eval)
+    for i in stub.names:
+      entry = self.seek(root, i)
+      if entry is not None and entry.tag.obj is placeholder:
+        self.rm([i])
+    self.Context, self.Caller = context, caller
+    self.Stack.data = stack
+    if running:
+      self.resume()
+    else:
+      self.Running = False
+
+    if quoted is not None and internals.tag.obj is quoted.data:
+      internals.tag.obj = quoted
+      self.Generation += 1
+
+  # Find the link before the first entry after current matching a name, as
+  # well as the first entry whose run it's in (or None), for rm's benefit.
+  def seekprev(self, current, name):
+    first = None
+    while current.next is not self.lastobj:
+      if current.index is not None and current is not first:
+        first = current
+        entry = current.index.get(name)
+        if entry is not None:
+          while current.next is not entry:
+            current = current.next
+          return current, first
+        current = current.last
+      elif current.next.index is None and current.next.tag.name == name:
+        return current, first
+      else:
+        current = current.next
+    return None, None
   
   # Try to find an object.
   def rcl(self, namelist):
@@ -143,11 +320,10 @@ class rplruntime:
     for i in namelist:
       # Make sure we're about to parade through an actual directory first.
       if current.typenum == self.dirtype:
-        # Start the parade, and return nothing if we didn't find a match.
-        while current.tag.name != i:
-          current = current.next
-          if current is self.lastobj:
-            return
+        current = self.seek(current, i)
+        # Return nothing if we didn't find a match.
+        if current is None:
+          return
         # If we got here, we did find a match, so return the object in it.
         current = current.tag.obj
       else:
@@ -161,11 +337,9 @@ class rplruntime:
     for i in range(len(namelist)):
       # Make sure we're about to parade through an actual directory first.
       if current.typenum == self.dirtype:
-        # Start the parade, and return nothing if we didn't find a match.
-        while current.tag.name != namelist[i]:
-         current = current.next
-         if current is self.lastobj:
-           return
+        current = self.seek(current, namelist[i])
+        if current is None:
+          return
         # If we got here, we did find a match, so return the object in it.
         if i+1 == len(namelist):
           return current.tag
@@ -183,29 +357,47 @@ class rplruntime:
     for i in namelist:
       # Make sure we're about to parade through an actual directory first.
       if current.typenum == self.dirtype:
-        # Start the parade.
-        while current.tag.name != i:
-          if current.next is self.lastobj:
-            # If we failed to find a subdirectory somewhere, cheese it.
-            if counter:
-              return False
-            # But if we got to the end of our name list, append a new entry.
-            else:
-              current.next = typedir(typetag(i, value), self.lastobj)
-              return True
-          current = current.next
+        entry = self.seek(current, i)
+        if entry is None:
+          # If we failed to find a subdirectory somewhere, cheese it.
+          if counter:
+            return False
+          # But if we got to the end of our name list, append a new entry.
+          else:
+            self.append(current, typetag(i, value))
+            return True
         # If we got here, we found a match, so decrement our counter.
         # But don't return the object unless we're still chasing down the tree.
+        current = entry
         if counter:
           counter -= 1
           current = current.tag.obj
       # Walked out of the directory tree?  That's a big fat False.
       else:
         return False
-    # If we got down here, we found an extant entry to update.
+    # If we got down here, we found an extant entry to update.  Swapping
+    # out a directory reroutes every dotted name passing through it.
+    if current.tag.obj.typenum == self.dirtype or value.typenum == self.dirtype:
+      self.Generation += 1
     current.tag.obj = value
     return True
 
+  # Add a tag to the very end of a directory chain, hopping from first entry
+  # to first entry, and keeping the last one's index up to date.
+  def append(self, current, tag):
+    self.Generation += 1
+    first = None
+    while True:
+      if current.index is not None:
+        first = current
+        current = current.last
+      if current.next is self.lastobj:
+        break
+      current = current.next
+    if first is not None and first.last is current:
+      first.link(tag)
+    else:
+      current.next = typedir(tag, self.lastobj)
 
   # Rummage through an already-stored directory tree and see if any symbols 
   # within it circulate (to a point.)
@@ -257,25 +449,29 @@ class rplruntime:
     # Start from the top.
     current = self.Context.names
     last = current
+    first = None
     for i in namelist:
       # Make sure we're about to parade through an actual directory first.
       # We also exempt empty directories here.
       if current.typenum == self.dirtype and \
          current.next is not self.lastobj:
         # Start the parade, and return False if we didn't find a match.
-        # We check the next link's name to a) skip the null-named firstdir
-        # and b) hang onto the current link to update its nextobj.
-        while current.next.tag.name != i:
-         current = current.next
-         if current.next is self.lastobj:
-           return False
+        # We look for the link before the match to a) skip the null-named
+        # firstdir and b) hang onto it to update its nextobj.
+        last, first = self.seekprev(current, i)
+        if last is None:
+          return False
         # If we got here, we did find a match, so return the object in it,
         # but keep our last link for the final event.
-        last = current
-        current = current.next.tag.obj
+        current = last.next.tag.obj
       else:
         return False
     # And if we got here, we don't care much about what the current object is;
-    # we're just going to pop it out of the chain.
-    last.next = last.next.next
+    # we're just going to pop it out of the chain, and out of the index of
+    # whichever first entry it was filed under.
+    self.Generation += 1
+    if first is None:
+      last.next = last.next.next
+    else:
+      first.unlink(last)
     return True
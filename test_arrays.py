@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Array tests
+
+# Arrays are NumPy arrays underneath when NumPy is about, and the array
+# module's otherwise, and the two don't behave alike in Python; an array
+# should behave the same in RPL either way.  Everything here runs once as
+# it finds things, and once more with NumPy hidden, if it was there.
+
+import bench, rtypes
+
+import unittest, io, contextlib
+
+class arraytests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python,
+  # arrays and lists as lists.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [self.python(i) for i in self.rt.Stack.data]
+
+  def python(self, obj):
+    if isinstance(obj, rtypes.typearray):
+      return obj.data.tolist()
+    elif isinstance(obj, rtypes.typelst):
+      return [self.python(i) for i in obj.data]
+    return obj.data
+
+  # Run some RPL which ought to die, and check it says why.
+  def dies(self, text, reason):
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      self.leaves(text)
+      self.rt.flush()
+    self.assertIn(reason, said.getvalue(), text)
+
+  def check(self):
+    self.equality()
+    self.arithmetic()
+    self.overflow()
+    self.ranges()
+    self.getput()
+    self.subsets()
+
+  def equality(self):
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY DUP =='), [1])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY { #1 #2 } >ARRAY =='),
+                     [1])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY { #1 #3 } >ARRAY =='),
+                     [0])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY { #1 } >ARRAY !='), [1])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY { 1. 2. } >ARRAY =='),
+                     [1])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY #1 =='), [0])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY { #1 #2 } =='), [0])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY DUP SAME'), [1])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY DUP #1 >LST SWAP HAS'),
+                     [1])
+    self.assertEqual(self.leaves('#5 { #1 #2 } >ARRAY #2 >LST '
+                                 '{ #1 #3 } >ARRAY HAS'), [0])
+
+  def arithmetic(self):
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY #3 +'), [[4, 5]])
+    self.assertEqual(self.leaves('#3 { #1 #2 } >ARRAY -'), [[2, 1]])
+    self.assertEqual(self.leaves('{ #7 #-7 } >ARRAY #2 /'), [[3, -3]])
+    self.assertEqual(self.leaves('{ #2 #3 } >ARRAY { #3 #2 } >ARRAY ^'),
+                     [[8, 9]])
+    self.assertEqual(self.leaves('{ #2 } >ARRAY #-1 ^'), [[0]])
+    self.assertEqual(self.leaves('{ 1.5 } >ARRAY #2 *'), [[3.0]])
+    self.dies('{ #1 } >ARRAY #0 /', 'Excuse you')
+    self.dies('{ #1 #2 } >ARRAY { #1 } >ARRAY +',
+              'These arrays do not line up')
+
+  # Integers that don't fit are an error, as they are everywhere else an
+  # array meets them, but right up to the edge they do fit.  Floats run off
+  # to infinity and back to nothing as plain floats do.
+  def overflow(self):
+    high = 'This produces an intolerably high number'
+    for text in ['{ #9223372036854775807 } >ARRAY #1 +',
+                 '#1 { #9223372036854775807 } >ARRAY +',
+                 '{ #9223372036854775807 } >ARRAY DUP +',
+                 '{ #-9223372036854775808 } >ARRAY #1 -',
+                 '#0 { #-9223372036854775808 } >ARRAY -',
+                 '{ #-9223372036854775808 } >ARRAY #-1 *',
+                 '{ #3037000500 } >ARRAY DUP *',
+                 '{ #2 } >ARRAY #63 ^',
+                 '{ #1 } >ARRAY #9223372036854775808 +',
+                 '{ 1e300 } >ARRAY #2 ^']:
+      self.dies(text, high)
+    self.assertEqual(self.leaves('{ #4611686018427387903 } >ARRAY #2 *'),
+                     [[9223372036854775806]])
+    self.assertEqual(self.leaves('{ #-4611686018427387904 } >ARRAY #2 *'),
+                     [[-9223372036854775808]])
+    self.assertEqual(self.leaves('{ #3037000499 } >ARRAY DUP *'),
+                     [[9223372030926249001]])
+    self.assertEqual(self.leaves('{ #-3 } >ARRAY #39 ^'),
+                     [[-4052555153018976267]])
+    self.assertEqual(self.leaves('{ 1e300 } >ARRAY DUP *'),
+                     [[float('inf')]])
+    self.assertEqual(self.leaves('{ 1e-300 } >ARRAY DUP *'), [[0.0]])
+
+  def ranges(self):
+    self.assertEqual(self.leaves('#0 #5 #2 RANGE'), [[0, 2, 4]])
+    self.assertEqual(self.leaves('#5 #0 #-2 RANGE'), [[5, 3, 1]])
+    self.assertEqual(self.leaves('0. #1 0.5 RANGE'), [[0.0, 0.5]])
+    self.assertEqual(self.leaves('#1 #1 #1 RANGE'), [[]])
+    self.assertEqual(self.leaves('#9223372036854775807 #9223372036854775800 '
+                                 '#-3 RANGE'),
+                     [[9223372036854775807, 9223372036854775804,
+                       9223372036854775801]])
+    self.dies('#0 #9223372036854775809 #4611686018427387904 RANGE',
+              'This range is going nowhere')
+    self.dies('#0 #1 #0 RANGE', 'This range is going nowhere')
+
+  def getput(self):
+    self.assertEqual(self.leaves('{ #9223372036854775807 #2 } >ARRAY #0 GET '
+                                 'DUP TYPE'),
+                     [9223372036854775807, self.rt.Types.id['Integer']])
+    self.assertEqual(self.leaves('{ #1 2.5 } >ARRAY #1 GET DUP TYPE'),
+                     [2.5, self.rt.Types.id['Float']])
+    self.assertEqual(self.leaves('{ #1 #2 } >ARRAY #-9223372036854775808 #1 '
+                                 'PUT'), [[1, -9223372036854775808]])
+    self.assertEqual(self.leaves('{ 1. } >ARRAY #2 #0 PUT'), [[2.0]])
+    self.dies('{ #1 #2 } >ARRAY #9223372036854775808 #0 PUT',
+              'This number is too big for an array')
+    self.dies('{ #1 #2 } >ARRAY 1.5 #0 PUT',
+              'An array of integers has no room for fractions')
+    self.dies('{ #1 #2 } >ARRAY #2 GET',
+              'This Array deserves a better subscript')
+
+  def subsets(self):
+    text = '{ #9223372036854775807 #2 #-9223372036854775808 } >ARRAY '
+    self.assertEqual(self.leaves(text+'#2 LEFT'),
+                     [[9223372036854775807, 2]])
+    self.assertEqual(self.leaves(text+'#1 RIGHT'), [[-9223372036854775808]])
+    self.assertEqual(self.leaves(text+'#1 #2 SUBS'),
+                     [[2, -9223372036854775808]])
+    self.assertEqual(self.leaves(text+'>LST'),
+                     [[9223372036854775807, 2, -9223372036854775808]])
+    self.assertEqual(self.leaves(text+'>LST #0 GET TYPE'),
+                     [self.rt.Types.id['Integer']])
+    self.assertEqual(self.leaves('{ 1. #2 } >ARRAY >LST #1 GET TYPE'),
+                     [self.rt.Types.id['Float']])
+
+  def test_asfound(self):
+    self.check()
+
+  @unittest.skipIf(rtypes.numpy is None, 'NumPy is not installed')
+  def test_withoutnumpy(self):
+    numpy, rtypes.numpy = rtypes.numpy, None
+    try:
+      self.check()
+    finally:
+      rtypes.numpy = numpy
+
+if __name__ == '__main__':
+  unittest.main()
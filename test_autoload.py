@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Autoload tests
+
+# Some modules aren't loaded until one of their names is evaluated.  Until
+# then, everything else sees the stubs standing in for them, and when it
+# happens, whatever was going on at the time shouldn't notice.
+
+import bench, rtypes
+
+import unittest, tempfile
+
+class autoloadtests(unittest.TestCase):
+  # Loading is the one thing we can't take back, so boot afresh each time.
+  def setUp(self):
+    self.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [i.data for i in self.rt.Stack.data]
+
+  def stub(self, name):
+    return "'"+name+" RCL TYPE Types.Autoload =="
+
+  def test_rcl(self):
+    self.assertEqual(self.leaves(self.stub('>SET')+' '+self.stub('KEYS')),
+                     [1, 1])
+
+  def test_sto(self):
+    self.assertEqual(self.leaves("#7 '>MAP STO >MAP "+self.stub('>SET')),
+                     [7, 1])
+
+  def test_eval(self):
+    got = self.leaves('#5 #6 { #1 #2 } >SET '+self.stub('>SET')+' '+
+                      self.stub('KEYS'))
+    self.assertEqual(got[:2], [5, 6])
+    self.assertEqual(got[3:], [0, 0])
+
+  # A stub part way along a dotted name is loaded too.
+  def test_dotted(self):
+    self.assertEqual(self.leaves('#5 ANSI.codes.esc '+self.stub('LEGEND')),
+                     [5, '\x1b', 0])
+
+  # A module making a mess of the stack makes it on a stack of its own.
+  def test_stack(self):
+    with tempfile.NamedTemporaryFile('w', suffix='.rpl') as module:
+      module.write("#99 ':: #42 ; 'lazy STO")
+      module.flush()
+      loader = self.rt.rcl(['>SET']).loader
+      self.rt.sto(['lazy'], rtypes.typestub([module.name], ['lazy'], loader,
+                                            'lazy'))
+      self.assertEqual(self.leaves('#5 lazy lazy'), [5, 42, 42])
+
+if __name__ == '__main__':
+  unittest.main()
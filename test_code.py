@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Code tests
+
+# Code runs the same stepped through as threaded code or looked up an
+# object at a time, and a Ctrl-C stops it wherever it's got to.
+
+import bench, rtypes
+
+import unittest, io, contextlib, threading
+
+class codetests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [i.data for i in self.rt.Stack.data]
+
+  def check(self):
+    self.assertEqual(self.leaves("#1 #2 + ':: #3 * ; EVAL"), [9])
+    self.assertEqual(self.leaves("':: DUP #1 > ':: DUP #1 - cf * ; IFT ; "
+                                 "'cf STO #10 cf 'cf RM"), [3628800])
+    self.assertEqual(self.leaves("#0 ':: #1 + DUP #1000 < ; REP"), [1000])
+    self.assertEqual(self.leaves("':: #1 ; 'cg STO ':: cg cg + ; 'ch STO ch "
+                                 "':: #2 ; 'cg STO ch 'cg RM 'ch RM"), [2, 4])
+    self.assertEqual(self.leaves("#1 ':: ':: #2 ; BEVAL #3 ; EVAL"), [1, 2])
+
+  def test_threaded(self):
+    eval, rtypes.typecontext.eval = rtypes.typecontext.eval, \
+                                    rtypes.typecontext.evalthreaded
+    try:
+      self.check()
+    finally:
+      rtypes.typecontext.eval = eval
+
+  def test_plain(self):
+    eval, rtypes.typecontext.eval = rtypes.typecontext.eval, \
+                                    rtypes.typecontext.evalplain
+    try:
+      self.check()
+    finally:
+      rtypes.typecontext.eval = eval
+
+  # Much as rpl.py's Ctrl-C handler does it, in the middle of an endless
+  # loop.
+  def test_break(self):
+    def ctrlc():
+      self.rt.Break = True
+      self.rt.Running = False
+    timer = threading.Timer(0.2, ctrlc)
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      timer.start()
+      self.leaves("':: #1 ; REP")
+      self.rt.flush()
+    timer.join()
+    self.assertIn('Break', said.getvalue())
+    self.assertFalse(self.rt.Break)
+    self.assertEqual(self.leaves('#1 #2 +'), [3])
+
+  # Nothing but builtins, and tags (see typetag), carries a dictionary
+  # around.
+  def test_slots(self):
+    rt = self.rt
+    for obj in [rtypes.typeint(1), rtypes.typefloat(1.), rtypes.typestr(''),
+                rtypes.typesym(['x']),
+                rtypes.typedir(rt.nulltag, rt.lastobj), rtypes.typelst([]),
+                rtypes.typecode([rt.Return]), rtypes.typequote(rt.nulltag),
+                rtypes.typecontext(rt.nullcode, rt.lastobj),
+                rtypes.typerem(''), rtypes.typearray(), rtypes.typemap({}),
+                rtypes.typeset({}), rtypes.typebytes(b'')]:
+      self.assertFalse(hasattr(obj, '__dict__'), obj.typename)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Dispatch table tests
+
+# However a builtin's table gets searched, row by row or looked up once it's
+# big enough to compile, the first row matching what's on the stack wins.
+
+import bench, rtypes, trivia
+
+import unittest
+
+class dispatchtests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+    cls.int = rtypes.typeint(1)
+    cls.str = rtypes.typestr('')
+
+  # A builtin whose dispatches are integers numbering its rows, padded in
+  # front with rows nothing will ever match, so that the same table can be
+  # tried small and big.
+  def made(self, rows, padding=0):
+    bin = rtypes.typebin()
+    bin.argct = len(rows[0])
+    bin.argck = [[1000+i]*bin.argct for i in range(padding)]+rows
+    bin.dispatches = [rtypes.typeint(i-padding)
+                      for i in range(len(bin.argck))]
+    bin.compile()
+    return bin
+
+  # Which row a builtin picks for these arguments, or None if it gives up.
+  def picks(self, bin, *args):
+    rt = self.rt
+    rt.Stack.data[:] = args
+    context = rt.Context
+    next = bin.eval(rt)
+    rt.Context = context
+    if any(next.__self__ is i for i in bin.dispatches):
+      return next.__self__.data
+    self.assertIn('ways to call', rt.Reason)
+    rt.Reason = None
+    return None
+
+  def check(self, padding):
+    i, s = self.int, self.str
+    I, S = i.typenum, s.typenum
+    made = lambda rows: self.made(rows, padding)
+    # A wildcard row in front of an exact one.
+    bin = made([[I, 0], [I, I]])
+    self.assertEqual(self.picks(bin, i, i), 0)
+    self.assertEqual(self.picks(bin, i, s), 0)
+    # And behind.
+    bin = made([[I, I], [0, 0]])
+    self.assertEqual(self.picks(bin, i, i), 0)
+    self.assertEqual(self.picks(bin, s, i), 1)
+    # Exact rows behind a wildcard which catches them only sometimes.
+    bin = made([[S, I], [0, I], [I, I], [I, S]])
+    for twice in range(2):
+      self.assertEqual(self.picks(bin, s, i), 0)
+      self.assertEqual(self.picks(bin, i, i), 1)
+      self.assertEqual(self.picks(bin, i, s), 3)
+      self.assertIsNone(self.picks(bin, s, s))
+    # Too few arguments for any row.
+    self.assertEqual(self.picks(made([[0, 0]]), i, i), 0)
+    self.rt.Stack.data[:] = [i]
+    context = self.rt.Context
+    made([[0, 0]]).eval(self.rt)
+    self.rt.Context = context
+    self.assertIn('arguments instead of', self.rt.Reason)
+    self.rt.Reason = None
+
+  def test_scanned(self):
+    self.assertIsNone(self.made([[0], [0]]).exact)
+    self.check(0)
+
+  def test_compiled(self):
+    self.assertIsNotNone(self.made([[0]], trivia.SCANROWS).exact)
+    self.check(50)
+
+  # Recompiling after hooking a row in place picks up the new dispatch, and a
+  # copy keeps its own table.
+  def test_hooked(self):
+    i = self.int
+    bin = self.made([[0]], 50)
+    self.assertEqual(self.picks(bin, i), 0)
+    saved = bin.cp()
+    bin.dispatches[-1] = rtypes.typeint(7)
+    bin.compile()
+    self.assertEqual(self.picks(bin, i), 7)
+    self.assertEqual(self.picks(saved, i), 0)
+
+if __name__ == '__main__':
+  unittest.main()
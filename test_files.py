@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# File tests
+
+# Lines and records go out and come back the same, whether a file is read,
+# mapped into memory, or read as bytes.  STREAM> leaves what DSK> would.
+
+import bench
+
+import unittest, tempfile, os
+
+class filetests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  def setUp(self):
+    scratch = tempfile.TemporaryDirectory()
+    self.addCleanup(scratch.cleanup)
+    self.scratch = scratch.name
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [self.py(i) for i in self.rt.Stack.data]
+
+  def py(self, obj):
+    if obj.typename == 'List':
+      return [self.py(i) for i in obj.data]
+    elif obj.typename == 'Bytes':
+      return bytes(obj.data)
+    return obj.data
+
+  def test_lines(self):
+    path = os.path.join(self.scratch, 'lines.txt')
+    self.leaves('"a" "b" #2 >LST "%s" "write" FOPEN DUP ROT SWAP '
+                'WRITELINES FCLOSE' % path)
+    with open(path) as file:
+      self.assertEqual(file.read(), 'a\nb\n')
+    for mode in ['read', 'map']:
+      self.assertEqual(self.leaves('"%s" "%s" FOPEN DUP READLINES SWAP FCLOSE'
+                                   % (path, mode)), [['a', 'b']], mode)
+    self.assertEqual(self.leaves('"%s" READF' % path), [['a', 'b']])
+
+  def test_mapped(self):
+    path = os.path.join(self.scratch, 'mapped.txt')
+    with open(path, 'w') as file:
+      file.write('a\nb\nc')
+    self.assertEqual(self.leaves('"%s" "map" FOPEN DUP READL SWAP DUP #2 READ '
+                                 'SWAP DUP EOF SWAP DUP #0 READ SWAP DUP EOF '
+                                 'SWAP FCLOSE' % path),
+                     ['a', 'b\n', 0, 'c', 1])
+
+  def test_records(self):
+    path = os.path.join(self.scratch, 'records.bin')
+    self.leaves('"ab" >BYTES "cd" >BYTES #2 >LST "%s" "writebytes" FOPEN '
+                'DUP ROT SWAP WRITERECS FCLOSE' % path)
+    with open(path, 'rb') as file:
+      self.assertEqual(file.read(), b'abcd')
+    opened = '"%s" "readbytes" FOPEN DUP ' % path
+    self.assertEqual(self.leaves(opened+'#2 #0 READRECS SWAP FCLOSE'),
+                     [[b'ab', b'cd']])
+    self.assertEqual(self.leaves(opened+'#3 #0 READRECS SWAP FCLOSE'),
+                     [[b'abc', b'd']])
+    self.assertEqual(self.leaves(opened+'#0 READ SWAP FCLOSE'), [b'abcd'])
+
+  def test_stream(self):
+    path = os.path.join(self.scratch, 'stream.rpl')
+    with open(path, 'w') as file:
+      file.write('#1 #2 + ( says ( hi ) ) "x" :: #3 ; EVAL `VERSION\n')
+    streamed = self.leaves('"%s" STREAM>' % path)
+    self.assertEqual(streamed, [3, 'x', 3, 'Codswallop RPL'])
+    self.assertEqual(self.leaves('"%s" DSK>' % path), streamed)
+
+if __name__ == '__main__':
+  unittest.main()
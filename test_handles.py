@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Handle tests
+
+# A handle that can't close when it's forgotten says so through the runtime
+# that opened it, after whatever the runtime already had to say.
+
+import bench, rtypes
+
+import unittest, io, contextlib
+
+class stuck:
+  def close(self):
+    raise OSError('stuck')
+
+class handletests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  def test_forgotten(self):
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      self.rt.write('Before\n')
+      handle = rtypes.typeio(stuck(), self.rt)
+      del handle
+    self.assertEqual(said.getvalue(), 'Before\nBy the way, a terrible fate '
+                     'has befallen a forgotten file handle\n')
+
+if __name__ == '__main__':
+  unittest.main()
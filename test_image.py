@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Boot image and parse cache tests
+
+# A runtime comes back out of its image able to carry on as it was, and what
+# DSK> parsed comes back out of the cache only while the file, and anything
+# recalled while parsing it, is still the same.  Nothing else comes back out
+# of a cache file, whatever it says.
+
+import bench, image, rtypes
+
+import unittest, tempfile, os, pickle
+
+class tampered:
+  def __init__(self, marker):
+    self.marker = marker
+  def __reduce__(self):
+    return os.system, ('touch '+self.marker,)
+
+class imagetests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  def setUp(self):
+    scratch = tempfile.TemporaryDirectory()
+    self.addCleanup(scratch.cleanup)
+    self.scratch = scratch.name
+
+  def test_image(self):
+    path = os.path.join(self.scratch, 'boot.img')
+    self.assertTrue(image.save(self.rt, path))
+    rt = image.load(path)
+    rt.Stack.data.clear()
+    bench.run(rt, "#1 #2 + ':: #3 * ; EVAL \"a\" #1 #2 >LST >MAP \"a\" GET")
+    self.assertEqual([i.data for i in rt.Stack.data], [9, 1])
+
+  # An open file can't be saved, so there's no image at all.
+  def test_unsaved(self):
+    path = os.path.join(self.scratch, 'boot.img')
+    with open(path, 'wb') as file:
+      self.rt.Stack.data[:] = [rtypes.typeio(file, self.rt)]
+      self.assertFalse(image.save(self.rt, path))
+    self.rt.Stack.data.clear()
+    self.assertFalse(os.path.exists(path))
+    self.assertIsNone(image.load(path))
+
+  def test_cache(self):
+    rt = self.rt
+    path = os.path.join(self.scratch, 'cached.rpl')
+    text = '#1 #2 + `VERSION "x"'
+    with open(path, 'w') as file:
+      file.write(text)
+    with bench.cachedin(self.scratch):
+      self.assertIsNone(image.loadparsed(rt, path, text))
+      rt.Stack.data.clear()
+      bench.run(rt, '"%s" DSK>' % path)
+      self.assertEqual([i.data for i in rt.Stack.data],
+                       [3, 'Codswallop RPL', 'x'])
+      cached = image.loadparsed(rt, path, text)
+      self.assertEqual([i.data for i in cached.data][:5],
+                       [1, 2, ['+'], 'Codswallop RPL', 'x'])
+      self.assertIsNone(image.loadparsed(rt, path, text+' '))
+      # Recalled at parse time, and different now.
+      version = rt.rcl(['VERSION'])
+      rt.sto(['VERSION'], rtypes.typestr('Something else'))
+      try:
+        self.assertIsNone(image.loadparsed(rt, path, text))
+      finally:
+        rt.sto(['VERSION'], version)
+      self.assertIsNotNone(image.loadparsed(rt, path, text))
+
+  def test_tampered(self):
+    path = os.path.join(self.scratch, 'cached.rpl')
+    marker = os.path.join(self.scratch, 'marker')
+    text = '#1'
+    with bench.cachedin(self.scratch):
+      os.makedirs(image.cachedir())
+      with open(image.cachepath(path), 'wb') as file:
+        pickle.dump((image.IMAGEVERSION, image.digest(text.encode()), [], []),
+                    file)
+        pickle.dump(tampered(marker), file)
+      self.assertIsNone(image.loadparsed(self.rt, path, text))
+    self.assertFalse(os.path.exists(marker))
+
+if __name__ == '__main__':
+  unittest.main()
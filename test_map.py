@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# MAP, FILTER and REDUCE tests
+
+# Each item gets one result, and an evaluator that leaves more or fewer
+# things than that is told so, rather than having its leftovers taken for
+# results, or its results taken out from under whatever was there before.
+
+import bench
+
+import unittest, io, contextlib
+
+class maptests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python,
+  # lists as lists.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [[j.data for j in i.data] if isinstance(i.data, list) else i.data
+            for i in self.rt.Stack.data]
+
+  # Run some RPL which ought to die, and check it says why.
+  def dies(self, text, reason):
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      self.leaves(text)
+      self.rt.flush()
+    self.assertIn(reason, said.getvalue(), text)
+
+  def test_map(self):
+    self.assertEqual(self.leaves("#5 { #1 #2 } ':: #10 * ; MAP"),
+                     [5, [10, 20]])
+    self.assertEqual(self.leaves("{ } 'DUP MAP"), [[]])
+    self.dies("#5 #6 #7 { #1 #2 } 'DROP MAP",
+              'Something was supposed to come of that')
+    self.dies("#5 { #1 #2 } 'DUP MAP", 'One thing at a time, if you please')
+
+  def test_filter(self):
+    self.assertEqual(self.leaves("#5 { #1 #2 #3 } ':: #2 > ; FILTER"),
+                     [5, [3]])
+    self.dies("#5 #1 { #1 #2 } 'DROP FILTER", 'Yes or no would have sufficed')
+    self.dies("#5 { #1 #2 } 'DUP FILTER", 'Yes or no would have sufficed')
+
+  def test_reduce(self):
+    self.assertEqual(self.leaves("#5 { #1 #2 #3 } #0 '+ REDUCE"), [5, 6])
+    self.assertEqual(self.leaves("#5 { } #0 '+ REDUCE"), [5, 0])
+    self.dies("#5 #6 { #1 #2 } #0 ':: DROP DROP ; REDUCE",
+              'Something was supposed to come of that')
+    self.dies("#5 { #1 #2 } #0 'DUP REDUCE",
+              'One thing at a time, if you please')
+
+if __name__ == '__main__':
+  unittest.main()
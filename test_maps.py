@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Map and set tests
+
+# Maps file values under strings, numbers and symbols, and sets keep one of
+# each.  Numbers that are equal are the same key, however they're written.
+
+import bench
+
+import unittest, io, contextlib
+
+class maptests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [[i.data for i in j.data] if isinstance(j.data, list) else j.data
+            for j in self.rt.Stack.data]
+
+  # Run some RPL which ought to die, and check it says why.
+  def dies(self, text, reason):
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      self.leaves(text)
+      self.rt.flush()
+    self.assertIn(reason, said.getvalue(), text)
+
+  def test_map(self):
+    made = '"a" #1 "b" #2 #4 >LST >MAP '
+    self.assertEqual(self.leaves(made+'DUP "b" GET SWAP "a" HAS'), [2, 1])
+    self.assertEqual(self.leaves(made+'"z" HAS'), [0])
+    self.assertEqual(self.leaves(made+'#9 "c" PUT DUP KEYS SWAP LEN'),
+                     [['a', 'b', 'c'], 3])
+    self.assertEqual(self.leaves(made+'"a" RMKEY >LST'), [['b', 2]])
+    self.assertEqual(self.leaves("'x #1 'y #2 #4 >LST >MAP 'y GET"), [2])
+    self.assertEqual(self.leaves('#1 "i" 1. "f" #4 >LST >MAP DUP LEN '
+                                 'SWAP #1 GET'), [1, 'f'])
+
+  # Somebody else's copy of the map doesn't see what's PUT in ours.
+  def test_shared(self):
+    self.assertEqual(self.leaves('"a" #1 #2 >LST >MAP DUP #5 "a" PUT '
+                                 '"a" GET SWAP "a" GET'), [5, 1])
+
+  def test_set(self):
+    self.assertEqual(self.leaves('#1 #2 #1 #3 >LST >SET DUP LEN SWAP #2 HAS'),
+                     [2, 1])
+    self.assertEqual(self.leaves('#1 #2 #2 >LST >SET #3 + #1 + KEYS'),
+                     [[1, 2, 3]])
+    self.assertEqual(self.leaves('"a" "b" #2 >LST >SET "a" RMKEY KEYS'),
+                     [['b']])
+
+  def test_errors(self):
+    self.dies('"a" #1 #2 >LST >MAP "z" GET', 'Nothing is filed under that')
+    self.dies('#1 #1 >LST >MAP', 'Every key wants a value')
+
+if __name__ == '__main__':
+  unittest.main()
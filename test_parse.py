@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Parser tests
+
+# The parser only asks the types which might want text starting the way it
+# does.  A type that never says which those are gets asked about everything,
+# in its turn.  Strings, numbers and comments are scanned in one go, but come
+# out just as they did a character at a time.
+
+import bench, parse, rtypes
+
+import unittest
+
+# Claims any word starting with an at sign, and doesn't say so up front.
+class typeat(rtypes.objarchetype):
+  __slots__ = ()
+  typename = 'At'
+
+  def parse(token):
+    cursor = token.cursor
+    if token.text[cursor] == '@':
+      while cursor < len(token.text) and \
+            token.text[cursor] not in token.whitespace:
+        cursor += 1
+      token.validnext(typeat(token.text[token.cursor:cursor]), cursor)
+
+# Claims integers with a bang in them, likewise.
+class typebang(rtypes.objarchetype):
+  __slots__ = ()
+  typename = 'Bang'
+
+  def parse(token):
+    cursor = token.cursor
+    if token.text.startswith('#!', cursor):
+      token.validnext(typebang('!'), cursor+2)
+
+class parsetests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+    cls.rt.Types.register(typeat)
+    cls.rt.Types.register(typebang)
+
+  def parsed(self, text):
+    return [(i.typename, i.data) for i in parse.parse(self.rt, text).data]
+
+  def test_anything(self):
+    self.assertEqual(self.parsed('{ @x #1 y }'),
+                     [('At', '@x'), ('Integer', 1), ('Symbol', ['y'])])
+
+  # Registered later, so asked first, even about what integers claim.
+  def test_order(self):
+    self.assertEqual(self.parsed('{ #! #2 }'),
+                     [('Bang', '!'), ('Integer', 2)])
+
+  # Nobody asks a type with nothing to say.
+  def test_unparsed(self):
+    for i in [self.rt.Types.anyparsers]+list(self.rt.Types.parsers.values()):
+      self.assertNotIn(rtypes.typestub, i)
+
+  # A backslash lets through whatever comes after it, and a last one with
+  # nothing after it just goes away.
+  def test_strings(self):
+    self.assertEqual(self.parsed(r'{ "a\"b" "c\\d" "e\nf" }'),
+                     [('String', 'a"b'), ('String', 'c\\d'),
+                      ('String', 'enf')])
+    self.assertEqual(parse.getstring('ab\\"c"d', 0, '"'), ('ab"c', 5))
+    self.assertEqual(parse.getstring('ab\\', 0, '"'), ('ab', 3))
+    long = 'x\\"'*100000
+    self.assertEqual(self.parsed('{ "'+long+'" }'),
+                     [('String', 'x"'*100000)])
+
+  def test_scanning(self):
+    self.assertEqual(self.parsed('{\t#12\n\r#-3 ( a ( b ) c ) 1.5 }'),
+                     [('Integer', 12), ('Integer', -3),
+                      ('Comment', ' a ( b ) c '), ('Float', 1.5)])
+    self.assertEqual(parse.getnumber('123x', 1), ('23', 3))
+    self.assertTrue(parse.validatename('a.b'))
+    self.assertFalse(parse.validatename('a{b'))
+    self.assertFalse(parse.validatename('a b'))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# PUT tests
+
+# PUT writes into a list in place when nothing else can see it, and into a
+# copy otherwise.  Everything else that can see the list, or the Python list
+# inside it, had better not notice either way.
+
+import bench, rtypes
+
+import unittest
+
+class puttests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [i.data for i in self.rt.Stack.data]
+
+  def test_put(self):
+    self.assertEqual([[i.data for i in j] for j in
+                      self.leaves('{ #1 #2 } #9 #0 PUT')], [[9, 2]])
+
+  # Nobody else has it, so nobody minds it being written in place.
+  def test_inplace(self):
+    self.rt.Stack.data.clear()
+    self.rt.Stack.push(rtypes.typelst([rtypes.typeint(1)]))
+    before = id(self.rt.Stack.data[0])
+    bench.run(self.rt, '#9 #0 PUT')
+    self.assertEqual(id(self.rt.Stack.data[0]), before)
+
+  def test_stack(self):
+    self.assertEqual(self.leaves('{ #1 #2 } DUP #9 #0 PUT DROP #0 GET'), [1])
+
+  def test_rcl(self):
+    self.assertEqual(self.leaves("{ #1 #2 } 'putl STO "
+                                 "'putl RCL #9 #0 PUT DROP "
+                                 "'putl RCL #0 GET 'putl RM"), [1])
+
+  # >LST makes a list of code's objects, which isn't the code's own list.
+  def test_code(self):
+    self.assertEqual(self.leaves("':: #1 #2 ; 'putc STO "
+                                 "'putc RCL >LST #9 #0 PUT DROP "
+                                 "putc 'putc RM"), [1, 2])
+    self.assertEqual(self.leaves("':: #1 #2 ; DUP >LST #9 #0 PUT DROP "
+                                 ">LST #0 GET"), [1])
+
+  def test_sub(self):
+    for sub in ['#2 LEFT', '#2 RIGHT', '#0 #1 SUBS']:
+      self.assertEqual(self.leaves('{ #1 #2 #3 } DUP '+sub+' #9 #0 PUT DROP '
+                                   '#0 GET'), [1])
+      self.assertEqual(self.leaves("{ #1 #2 #3 } 'puts STO "
+                                   "'puts RCL "+sub+" #9 #0 PUT DROP "
+                                   "'puts RCL #0 GET 'puts RM"), [1])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# SORT and SORTBY tests
+
+# Numbers sort among themselves, integers and floats alike, and strings
+# among themselves, but the two don't sort together.  Things that tie keep
+# their order.
+
+import bench
+
+import unittest, io, contextlib
+
+class sorttests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python,
+  # lists as lists.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [[j.data for j in i.data] if isinstance(i.data, list) else i.data
+            for i in self.rt.Stack.data]
+
+  # The type names of what's in the list on top of the stack.
+  def types(self):
+    return [i.typename for i in self.rt.Stack.data[-1].data]
+
+  # Run some RPL which ought to die, and check it says why.
+  def dies(self, text, reason):
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      self.leaves(text)
+      self.rt.flush()
+    self.assertIn(reason, said.getvalue(), text)
+
+  def test_sort(self):
+    self.assertEqual(self.leaves('{ #3 #1 #2 } SORT'), [[1, 2, 3]])
+    self.assertEqual(self.leaves('{ "pear" "apple" "fig" } SORT'),
+                     [['apple', 'fig', 'pear']])
+    self.assertEqual(self.leaves('{ } SORT'), [[]])
+
+  def test_mixed(self):
+    self.assertEqual(self.leaves('{ #3 1.5 #-2 2.5 } SORT'),
+                     [[-2, 1.5, 2.5, 3]])
+    self.assertEqual(self.types(), ['Integer', 'Float', 'Float', 'Integer'])
+    self.assertEqual(self.leaves('{ 2. #1 #2 } SORT'), [[1, 2, 2]])
+    self.assertEqual(self.types(), ['Integer', 'Float', 'Integer'])
+
+  def test_apples(self):
+    self.dies('#5 { #1 "a" } SORT', 'Apples and oranges have no order')
+    # The list is left as it was found.
+    self.assertEqual(self.rt.Stack.data[0].data, 5)
+    self.assertEqual(self.types(), ['Integer', 'String'])
+    self.dies('{ { #1 } { #2 } } SORT', 'Apples and oranges have no order')
+
+  def test_sortby(self):
+    self.assertEqual(self.leaves("{ #-3 #1 #2 } 'ABS SORTBY"), [[1, 2, -3]])
+    self.assertEqual(self.leaves("{ \"ccc\" \"a\" \"bb\" \"d\" } 'LEN SORTBY"),
+                     [['a', 'd', 'bb', 'ccc']])
+    self.assertEqual(self.leaves("#5 { } 'ABS SORTBY"), [5, []])
+
+  def test_badkey(self):
+    self.dies("{ #1 \"a\" } ':: ; SORTBY", 'Apples and oranges have no order')
+    self.dies("{ #1 #2 } 'DROP SORTBY",
+              'Something was supposed to come of that')
+    self.dies("#5 { #1 #2 } 'DUP SORTBY",
+              'One thing at a time, if you please')
+    self.dies("#5 { #1 \"a\" #2 } ':: #1 - ; SORTBY",
+              'There are 4 ways to call')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Stack tests
+
+# Shuffling works on the top of the stack however much is underneath, and
+# asking for more lines than there are leaves everything where it was.
+
+import bench
+
+import unittest, io, contextlib
+
+class stacktests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [i.data for i in self.rt.Stack.data]
+
+  # Run some RPL which ought to die, and check it says why.
+  def dies(self, text, reason):
+    said = io.StringIO()
+    with contextlib.redirect_stdout(said):
+      self.leaves(text)
+      self.rt.flush()
+    self.assertIn(reason, said.getvalue(), text)
+
+  def test_shuffles(self):
+    below = ' '.join('#%d' % i for i in range(100, 1100))
+    for text, top in [['#3 ROLL', [1, 2, 4, 5, 3]],
+                      ['#3 ROLLD', [1, 2, 5, 3, 4]],
+                      ['#1 ROLL', [1, 2, 3, 4, 5]],
+                      ['#5 ROLL', [2, 3, 4, 5, 1]],
+                      ['#5 ROLLD', [5, 1, 2, 3, 4]],
+                      ['ROT', [1, 2, 4, 5, 3]],
+                      ['ROTD', [1, 2, 5, 3, 4]],
+                      ['SWAP', [1, 2, 3, 5, 4]],
+                      ['#3 PICK', [1, 2, 3, 4, 5, 3]],
+                      ['#2 DUPN', [1, 2, 3, 4, 5, 4, 5]],
+                      ['DUP2', [1, 2, 3, 4, 5, 4, 5]],
+                      ['#2 DROPN', [1, 2, 3]],
+                      ['#0 DROPN', [1, 2, 3, 4, 5]],
+                      ['#3 >LST', [1, 2, [3, 4, 5]]]]:
+      got = self.leaves(below+' #1 #2 #3 #4 #5 '+text)
+      self.assertEqual(got[:1000], list(range(100, 1100)), text)
+      got = [[i.data for i in j] if isinstance(j, list) else j
+             for j in got[1000:]]
+      self.assertEqual(got, top, text)
+
+  def test_shallow(self):
+    for text, reason in [['ROLL', 'Your katamari is not big enough'],
+                         ['ROLLD', 'Your katamari is not big enough'],
+                         ['PICK', "A pick beyond one's reach"],
+                         ['DUPN', 'Duplicate how many things now'],
+                         ['DROPN', 'That is not a reasonable number']]:
+      self.dies('#1 #2 #3 '+text, reason)
+      self.assertEqual([i.data for i in self.rt.Stack.data], [1, 2, 3], text)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# Named store tests
+
+# Directories keep an index of their names, symbols remember what they
+# found last time, and locals sit in front of everything else.  None of
+# that should ever be seen to happen: every name finds whatever a walk
+# through the store from the front would have found, however the store
+# has changed since.
+
+import bench
+
+import unittest
+
+class storetests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [i.data for i in self.rt.Stack.data]
+
+  # Plenty of names, stored, found, and some of them erased again.
+  def test_many(self):
+    names = ['n%d' % i for i in range(200)]
+    self.leaves(' '.join('#%d \'%s STO' % (i, name)
+                         for i, name in enumerate(names)))
+    self.assertEqual(self.leaves(' '.join(names)), list(range(200)))
+    self.leaves(' '.join("'%s RM" % name for name in names[::2]))
+    self.assertEqual(self.leaves(' '.join("'%s EXISTS" % name
+                                          for name in names[:4])),
+                     [0, 1, 0, 1])
+    self.assertEqual(self.leaves(' '.join(names[1::2])),
+                     list(range(1, 200, 2)))
+    self.leaves(' '.join("'%s RM" % name for name in names[1::2]))
+    self.assertEqual(self.leaves("'n1 EXISTS"), [0])
+
+  # A symbol evaluated once still finds what's there now, not what was.
+  def test_restore(self):
+    self.assertEqual(self.leaves("':: #1 ; 'sf STO ':: sf ; 'sg STO sg "
+                                 "':: #2 ; 'sf STO sg 'sf RM "
+                                 "#3 'sf STO sg 'sf RM 'sg RM"), [1, 2, 3])
+
+  # Or what's been stored in front of it since.
+  def test_shadow(self):
+    self.assertEqual(self.leaves("':: sx ; 'sgx STO #1 'sx STO sgx "
+                                 "#9 ':: sgx ; { sx } LOCAL sgx "
+                                 "'sx RM 'sgx RM"), [1, 9, 1])
+
+  # Swapping a directory out swaps everything in it.
+  def test_directory(self):
+    self.assertEqual(self.leaves("MKDIR 'sd STO #1 'sd.x STO "
+                                 "':: sd.x ; 'sh STO sh "
+                                 "MKDIR 'se STO #2 'se.x STO 'se RCL 'sd STO "
+                                 "sh 'sd RM 'se RM 'sh RM"), [1, 2])
+
+  # The first name gets the first line, and so on down.
+  def test_locals(self):
+    self.assertEqual(self.leaves("#1 #2 ':: la lb - ; { la lb } LOCAL"),
+                     [1])
+    self.assertEqual(self.leaves("#1 ':: #5 'la STO la ; { la } LOCAL "
+                                 "'la EXISTS"), [5, 0])
+    self.assertEqual(self.leaves("#1 ':: #2 ':: la lb ; { lb } LOCAL ; "
+                                 "{ la } LOCAL"), [1, 2])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+
+# CODSWALLOP RPL (a zen garden)
+# #####################################################
+# String tests
+
+# SPLIT, JOIN, FIND and REPLACE do what Python's own would.
+
+import bench
+
+import unittest
+
+class stringtests(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.rt = bench.boot()
+
+  # Run some RPL on an empty stack, and return what it leaves as Python.
+  def leaves(self, text):
+    self.rt.Stack.data.clear()
+    bench.run(self.rt, text)
+    return [[i.data for i in j.data] if isinstance(j.data, list) else j.data
+            for j in self.rt.Stack.data]
+
+  def test_split(self):
+    self.assertEqual(self.leaves('"a,b,,c" "," SPLIT'), [['a', 'b', '', 'c']])
+    self.assertEqual(self.leaves('"" "," SPLIT'), [['']])
+    # An empty delimiter splits on runs of whitespace, and ignores the ends.
+    self.assertEqual(self.leaves('"  a b\tc " "" SPLIT'), [['a', 'b', 'c']])
+
+  def test_join(self):
+    self.assertEqual(self.leaves('"a,b" "," SPLIT "-" JOIN'), ['a-b'])
+    self.assertEqual(self.leaves('{ } "," JOIN'), [''])
+
+  def test_find(self):
+    self.assertEqual(self.leaves('"hello" "l" FIND "hello" "z" FIND '
+                                 '"hello" "" FIND'), [2, -1, 0])
+
+  def test_replace(self):
+    self.assertEqual(self.leaves('"hello" "l" "L" REPLACE'), ['heLLo'])
+    self.assertEqual(self.leaves('"hello" "z" "L" REPLACE'), ['hello'])
+
+if __name__ == '__main__':
+  unittest.main()
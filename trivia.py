@@ -22,8 +22,40 @@ INTERNALSDIR = 'I*'
 # Boot program: read and execute 'boot.rpl' out of the base directory.
 LAUNCHCODE = ':: BASDIR "boot.rpl" '+INTERNALSDIR+'.+str '+INTERNALSDIR+'.dsk> ;'
 
+# File, next to our own Python, to keep a boot image in, so starting up
+# needn't load every module from scratch.  None to always boot the long way.
+BOOTIMAGE = 'boot.img'
+
+# Directory, in the user's cache directory, to keep what DSK> parsed out of
+# each file in.  None to parse every file every time.
+PARSECACHE = 'codswallop-rpl'
+
+# Step through code objects by way of a cached tuple of eval methods, rather
+# than looking up each object's eval every time.  That saves some 40 ns a
+# step of a context, but only a third or so of all steps are those, so
+# whole programs only come out a few percent ahead (see bench.py
+# threadcode).
+THREADCODE = True
+
+# Builtins with this many rows in their dispatch tables or fewer search them
+# in order, which beats building a key to look up for so few.
+SCANROWS = 2
+
 # Maximum number of bytes to read from a file into the parser.
 MAXREAD = 256000
 
+# How much of a file to read at a time when streaming it into the parser.
+STREAMCHUNK = 65536
+
+# Console output is saved up and written this many characters at a time,
+# or sooner when we prompt, trace back an error, or finish.
+OUTBUFFER = 8192
+
+# On a terminal, also write out each line as it's finished.
+TTYLINES = True
+
+# How many numbers of an array to show before giving up.
+ARRAYSHOW = 8
+
 # Symbol to evaluate when ded.
 DEDEVAL = ['EXCEPT']